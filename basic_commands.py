@@ -1,15 +1,65 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import time
-import platform
 import logging
 
+from guild_stats import GuildStatsCache
+from embed_cache import EmbedCache
+
 class BasicCommands(commands.Cog):
     """Basic commands for the Discord bot"""
     
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger('discord.basic_commands')
+        self.guild_stats = GuildStatsCache()
+        self.embeds = EmbedCache(bot)
+
+    async def cog_load(self):
+        self.reconcile_guild_stats.start()
+
+    async def cog_unload(self):
+        self.reconcile_guild_stats.cancel()
+
+    @tasks.loop(minutes=30)
+    async def reconcile_guild_stats(self):
+        """Recount cached guild stats in case events were missed."""
+        drifted = self.guild_stats.reconcile(self.bot.guilds)
+        if drifted:
+            self.logger.info(f"Corrected drifted stats for {drifted} guild(s)")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Every extension is loaded by now, build the help pages up front
+        self.embeds.warm()
+
+    # Keep the serverinfo counts current without recounting
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.guild_stats.member_joined(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.guild_stats.member_left(member)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.guild_stats.channel_created(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.guild_stats.channel_deleted(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        self.guild_stats.channel_updated(before, after)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.guild_stats.forget(guild)
+        lookup = getattr(self.bot, "member_lookup", None)
+        if lookup is not None:
+            lookup.forget_guild(guild)
     
     @commands.command(name="hello")
     async def hello(self, ctx):
@@ -19,19 +69,8 @@ class BasicCommands(commands.Cog):
     @commands.command(name="info")
     async def info(self, ctx):
         """Display information about the bot."""
-        embed = discord.Embed(
-            title="Bot Information",
-            description="Information about this Discord bot",
-            color=discord.Color.blue()
-        )
-        
-        # Add bot information
-        embed.add_field(name="Bot Name", value=self.bot.user.name, inline=True)
-        embed.add_field(name="Bot ID", value=self.bot.user.id, inline=True)
-        embed.add_field(name="Discord.py Version", value=discord.__version__, inline=True)
-        embed.add_field(name="Python Version", value=platform.python_version(), inline=True)
-        embed.add_field(name="Platform", value=platform.system(), inline=True)
-        embed.add_field(name="Prefix", value=self.bot.command_prefix, inline=True)
+        # Only uptime and server count change between calls
+        embed = self.embeds.info().copy()
         
         # Calculate uptime
         uptime = int(time.time() - self.bot.uptime) if hasattr(self.bot, 'uptime') else 0
@@ -69,22 +108,32 @@ class BasicCommands(commands.Cog):
         
         # Add basic information
         embed.add_field(name="Server ID", value=guild.id, inline=True)
-        embed.add_field(name="Owner", value=guild.owner.mention if guild.owner else "Unknown", inline=True)
+        # Without a member cache the owner is fetched once and kept in the member LRU
+        owner = guild.owner
+        lookup = getattr(self.bot, "member_lookup", None)
+        if owner is None and lookup is not None and guild.owner_id:
+            owner = await lookup.get(guild, guild.owner_id)
+        embed.add_field(name="Owner", value=owner.mention if owner else "Unknown", inline=True)
         embed.add_field(name="Created At", value=guild.created_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
         
-        # Add member information
+        # Add member information (counts are cached and kept current from events)
+        stats = self.guild_stats.get(guild)
         total_members = guild.member_count
-        bot_count = len([m for m in guild.members if m.bot])
-        human_count = total_members - bot_count
         
         embed.add_field(name="Total Members", value=total_members, inline=True)
-        embed.add_field(name="Humans", value=human_count, inline=True)
-        embed.add_field(name="Bots", value=bot_count, inline=True)
+        if guild.chunked:
+            bot_count = stats.bots
+            human_count = total_members - bot_count
+            embed.add_field(name="Humans", value=human_count, inline=True)
+            embed.add_field(name="Bots", value=bot_count, inline=True)
+        else:
+            # Bots can only be counted from the full member list, which isn't cached
+            embed.add_field(name="Humans / Bots", value="Member list not cached", inline=True)
         
         # Add channel information
-        text_channels = len(guild.text_channels)
-        voice_channels = len(guild.voice_channels)
-        categories = len(guild.categories)
+        text_channels = stats.text_channels
+        voice_channels = stats.voice_channels
+        categories = stats.categories
         
         embed.add_field(name="Text Channels", value=text_channels, inline=True)
         embed.add_field(name="Voice Channels", value=voice_channels, inline=True)
@@ -99,44 +148,15 @@ class BasicCommands(commands.Cog):
     async def custom_help(self, ctx, command=None):
         """Display custom help information for commands."""
         if command:
-            # Get help for a specific command
-            cmd = self.bot.get_command(command)
-            if cmd:
-                embed = discord.Embed(
-                    title=f"Help: {cmd.name}",
-                    description=cmd.help or "No description available",
-                    color=discord.Color.blue()
-                )
-                
-                # Add usage information if available
-                if cmd.signature:
-                    embed.add_field(name="Usage", value=f"{self.bot.command_prefix}{cmd.name} {cmd.signature}", inline=False)
-                else:
-                    embed.add_field(name="Usage", value=f"{self.bot.command_prefix}{cmd.name}", inline=False)
-                
-                await ctx.send(embed=embed)
+            # Get help for a specific command (pages are pre-built)
+            page = self.embeds.help_page(command)
+            if page is not None:
+                await ctx.send(embed=page)
             else:
                 await ctx.send(f"Command '{command}' not found.")
         else:
             # General help - list all commands by cog
-            embed = discord.Embed(
-                title="Bot Commands",
-                description=f"Use `{self.bot.command_prefix}help <command>` for detailed help",
-                color=discord.Color.blue()
-            )
-            
-            # Organize commands by cog
-            for cog_name, cog in self.bot.cogs.items():
-                # Get commands that are not hidden
-                commands_list = [f"`{self.bot.command_prefix}{cmd.name}`" for cmd in cog.get_commands() if not cmd.hidden]
-                
-                if commands_list:
-                    embed.add_field(name=cog_name, value=", ".join(commands_list), inline=False)
-            
-            # Add uncategorized commands
-            uncategorized = [f"`{self.bot.command_prefix}{cmd.name}`" for cmd in self.bot.commands if not cmd.cog and not cmd.hidden]
-            if uncategorized:
-                embed.add_field(name="Uncategorized", value=", ".join(uncategorized), inline=False)
+            embed = self.embeds.help_overview().copy()
             
             # Set footer
             embed.set_footer(text=f"Requested by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
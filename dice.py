@@ -0,0 +1,326 @@
+import math
+import random
+import re
+from collections import Counter
+
+from variates import _import_numpy
+
+MAX_TERMS = 20
+MAX_SIDES = 1_000_000
+MAX_DICE = 10_000_000       # dice per roll
+SPLIT_MAX_SIDES = 1000      # without numpy, bigger dice are rolled one by one...
+FALLBACK_MAX_DICE = 100_000  # ...and only this many of them per roll
+LIST_LIMIT = 100            # above this, summarise instead of listing every die
+MAX_EXPLOSIONS = 100        # rounds of exploding dice
+DISCORD_LIMIT = 2000
+
+_TERM = re.compile(r"(?P<count>\d*)d(?P<sides>\d+)(?P<explode>!)?(?:k(?P<which>[hl])?(?P<keep>\d+))?$")
+_SPLIT = re.compile(r"([+-])")
+
+
+class DiceError(ValueError):
+    """Raised for dice notation that can't be parsed or is too large to roll."""
+
+
+class DiceTerm:
+    """One ``NdM`` term, e.g. ``4d6k3`` or ``10d10!``."""
+
+    __slots__ = ("sign", "count", "sides", "explode", "keep", "keep_lowest")
+
+    def __init__(self, sign, count, sides, explode=False, keep=None, keep_lowest=False):
+        self.sign = sign
+        self.count = count
+        self.sides = sides
+        self.explode = explode
+        self.keep = keep
+        self.keep_lowest = keep_lowest
+
+    def __str__(self):
+        text = f"{self.count}d{self.sides}"
+        if self.explode:
+            text += "!"
+        if self.keep is not None:
+            text += f"k{'l' if self.keep_lowest else 'h'}{self.keep}"
+        return text
+
+
+class TermResult:
+    """The dice rolled for one term.
+
+    Small rolls keep every die in ``rolls`` (in order, explosions following
+    the die that exploded) and the indexes that count in ``kept``. Large
+    rolls only keep the ``histogram`` of face -> number of dice.
+    """
+
+    def __init__(self, term, histogram, rolls=None, kept=None):
+        self.term = term
+        self.histogram = histogram
+        self.rolls = rolls
+        self.kept = kept
+        self.dice = sum(histogram.values())
+        self.total = term.sign * sum(face * n for face, n in _kept_histogram(term, histogram).items())
+
+    def summary(self):
+        """Dice count, mean, standard deviation, min and max of the rolled faces."""
+        n = self.dice
+        mean = sum(face * c for face, c in self.histogram.items()) / n
+        variance = sum(c * (face - mean) ** 2 for face, c in self.histogram.items()) / n
+        return {
+            "dice": n,
+            "mean": mean,
+            "stdev": math.sqrt(variance),
+            "min": min(self.histogram),
+            "max": max(self.histogram),
+        }
+
+
+class RollResult:
+    """A whole roll: the dice terms, the flat modifier and the grand total."""
+
+    def __init__(self, expression, terms, modifier):
+        self.expression = expression
+        self.terms = terms
+        self.modifier = modifier
+        self.total = sum(term.total for term in terms) + modifier
+
+
+def parse(expression):
+    """
+    Parse dice notation.
+
+    Supports ``NdM`` (N defaults to 1), exploding dice (``NdM!``, every
+    maximum roll adds another die), keep highest/lowest (``NdMkK``,
+    ``NdMkhK``, ``NdMklK``) and any number of terms and flat modifiers
+    joined by ``+`` and ``-``, e.g. ``4d6k3+1d8!-2``.
+
+    Args:
+        expression (str): Dice notation
+
+    Returns:
+        tuple: (list of DiceTerm, int flat modifier)
+
+    Raises:
+        DiceError: The notation is invalid or over the limits
+    """
+    text = expression.replace(" ", "").lower()
+    parts = _SPLIT.split(text)
+    if parts[0] == "":
+        parts = parts[1:]
+    else:
+        parts.insert(0, "+")
+    if len(parts) // 2 > MAX_TERMS:
+        raise DiceError(f"You can't roll more than {MAX_TERMS} terms at once.")
+
+    terms = []
+    modifier = 0
+    for sign_text, part in zip(parts[::2], parts[1::2]):
+        sign = -1 if sign_text == "-" else 1
+        if part.isdigit():
+            modifier += sign * int(part)
+            continue
+        match = _TERM.match(part)
+        if match is None:
+            raise DiceError(f"I don't understand `{part or sign_text}`.")
+        count = int(match["count"] or 1)
+        sides = int(match["sides"])
+        keep = int(match["keep"]) if match["keep"] else None
+        if count <= 0 or sides <= 0:
+            raise DiceError("Number of dice and sides must be positive numbers.")
+        if sides > MAX_SIDES:
+            raise DiceError(f"Dice can't have more than {MAX_SIDES:,} sides.")
+        if match["explode"] and sides == 1:
+            raise DiceError("A one-sided die would explode forever.")
+        if keep is not None and keep <= 0:
+            raise DiceError("You have to keep at least one die.")
+        terms.append(DiceTerm(sign, count, sides, bool(match["explode"]), keep, match["which"] == "l"))
+
+    if not terms:
+        raise DiceError("There's nothing to roll.")
+    if sum(term.count for term in terms) > MAX_DICE:
+        raise DiceError(f"You can't roll more than {MAX_DICE:,} dice at once.")
+    if _import_numpy() is None:
+        big = sum(term.count for term in terms if term.sides > SPLIT_MAX_SIDES and term.count > LIST_LIMIT)
+        if big > FALLBACK_MAX_DICE:
+            raise DiceError(
+                f"You can't roll more than {FALLBACK_MAX_DICE:,} dice with over {SPLIT_MAX_SIDES:,} sides at once."
+            )
+    return terms, modifier
+
+
+def roll(expression, rng=random):
+    """
+    Roll dice notation (see :func:`parse`).
+
+    Up to LIST_LIMIT dice are rolled one by one so every die can be shown.
+    Above that only the number of dice per face is drawn: a multinomial
+    draw with numpy (one call, whatever the number of dice), or without it
+    one binomial draw per face (for dice with up to SPLIT_MAX_SIDES sides)
+    or a single ``random.choices`` call.
+
+    Args:
+        expression (str): Dice notation
+        rng: Random source for small rolls (random module API)
+
+    Returns:
+        RollResult: The rolled terms and total
+
+    Raises:
+        DiceError: The notation is invalid or over the limits
+    """
+    terms, modifier = parse(expression)
+    results = []
+    for term in terms:
+        if term.count <= LIST_LIMIT:
+            results.append(_roll_listed(term, rng))
+        else:
+            results.append(_roll_counted(term))
+    return RollResult(expression, results, modifier)
+
+
+def _roll_listed(term, rng):
+    rolls = []
+    for _ in range(term.count):
+        value = rng.randint(1, term.sides)
+        rolls.append(value)
+        rounds = 0
+        while term.explode and value == term.sides and rounds < MAX_EXPLOSIONS:
+            value = rng.randint(1, term.sides)
+            rolls.append(value)
+            rounds += 1
+    kept = range(len(rolls))
+    if term.keep is not None:
+        order = sorted(kept, key=rolls.__getitem__, reverse=not term.keep_lowest)
+        kept = order[:term.keep]
+    return TermResult(term, Counter(rolls), rolls, set(kept))
+
+
+def _roll_counted(term):
+    histogram = _face_counts(term.count, term.sides)
+    pending = histogram.get(term.sides, 0) if term.explode else 0
+    rounds = 0
+    while pending and rounds < MAX_EXPLOSIONS:
+        extra = _face_counts(pending, term.sides)
+        for face, n in extra.items():
+            histogram[face] = histogram.get(face, 0) + n
+        pending = extra.get(term.sides, 0)
+        rounds += 1
+    return TermResult(term, histogram)
+
+
+def _binomial(n, p, rng=random):
+    """
+    Number of successes in ``n`` trials with probability ``p``, in time that
+    doesn't grow with ``n``.
+
+    Uses ``random.binomialvariate`` (Python 3.12+) where there is one.
+    Otherwise: a normal approximation once the variance is at least 1000,
+    and counting the gaps between successes below that (O(n * p) with
+    p <= 0.5, so at most a few thousand steps).
+    """
+    if p <= 0 or n <= 0:
+        return 0
+    if p >= 1:
+        return n
+    binomialvariate = getattr(rng, "binomialvariate", None)
+    if binomialvariate is not None:
+        return binomialvariate(n, p)
+    if p > 0.5:
+        return n - _binomial(n, 1 - p, rng)
+    variance = n * p * (1 - p)
+    if variance >= 1000:
+        return min(max(round(rng.gauss(n * p, math.sqrt(variance))), 0), n)
+    log_q = math.log1p(-p)
+    successes = trial = 0
+    while True:
+        # Trials up to and including the next success are geometric
+        trial += int(math.log(1.0 - rng.random()) / log_q) + 1
+        if trial > n:
+            return successes
+        successes += 1
+
+
+def _face_counts(count, sides):
+    # How many of ``count`` dice landed on each face, without a Python-level
+    # loop per die
+    numpy = _import_numpy()
+    if numpy is None:
+        if count <= sides or sides > SPLIT_MAX_SIDES:
+            return Counter(random.choices(range(1, sides + 1), k=count))
+        # Multinomial as a chain of binomials: each face takes its share of
+        # the dice not on a lower face, so the work grows with the sides only
+        counts = {}
+        for face in range(1, sides):
+            n = _binomial(count, 1 / (sides - face + 1))
+            if n:
+                counts[face] = n
+                count -= n
+            if not count:
+                return counts
+        counts[sides] = count
+        return counts
+    rng = numpy.random.default_rng()
+    if count < sides:
+        faces, counts = numpy.unique(rng.integers(1, sides + 1, size=count), return_counts=True)
+    else:
+        counts = rng.multinomial(count, numpy.full(sides, 1 / sides))
+        faces = numpy.flatnonzero(counts)
+        counts = counts[faces]
+        faces += 1
+    return dict(zip(faces.tolist(), counts.tolist()))
+
+
+def _kept_histogram(term, histogram):
+    if term.keep is None:
+        return histogram
+    kept = {}
+    remaining = term.keep
+    for face in sorted(histogram, reverse=not term.keep_lowest):
+        if remaining <= 0:
+            break
+        n = min(histogram[face], remaining)
+        kept[face] = n
+        remaining -= n
+    return kept
+
+
+def format_result(result, limit=DISCORD_LIMIT):
+    """
+    Describe a roll in one Discord message.
+
+    Args:
+        result (RollResult): The roll
+        limit (int): Maximum message length
+
+    Returns:
+        str: The message, truncated to ``limit`` characters
+    """
+    terms = result.terms
+    if len(terms) == 1 and not result.modifier and terms[0].rolls is not None and len(terms[0].rolls) == 1:
+        return f"🎲 You rolled a **{result.total}**"
+
+    lines = []
+    for term in terms:
+        sign = "-" if term.term.sign < 0 else ""
+        if term.rolls is not None:
+            shown = ", ".join(
+                str(value) if index in term.kept else f"~~{value}~~"
+                for index, value in enumerate(term.rolls)
+            )
+            lines.append(f"`{sign}{term.term}`: {shown}")
+            continue
+        stats = term.summary()
+        line = (
+            f"`{sign}{term.term}`: {stats['dice']:,} dice, mean {stats['mean']:.2f}, "
+            f"σ {stats['stdev']:.2f}, min {stats['min']}, max {stats['max']}"
+        )
+        if term.term.sides <= 20:
+            line += "\n" + " · ".join(f"{face}: {term.histogram.get(face, 0):,}" for face in range(1, term.term.sides + 1))
+        lines.append(line)
+    if result.modifier:
+        lines.append(f"Modifier: {result.modifier:+d}")
+
+    header = f"🎲 **{result.expression}** → **{result.total:,}**"
+    message = "\n".join([header, *lines])
+    if len(message) > limit:
+        message = message[:limit - 1] + "…"
+    return message
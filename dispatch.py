@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import logging
+import re
+import time
+from collections import deque
+
+from discord.ext import commands
+
+from instrumentation import CommandStats
+from metrics import counter, gauge
+
+MAX_MESSAGE_LENGTH = 2000
+
+
+class RateLimitLogCounter(logging.Handler):
+    """Counts the 429 retries discord.py logs, since it handles them internally."""
+
+    _RETRY = re.compile(r"Retrying in ([\d.]+) seconds")
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def emit(self, record):
+        match = self._RETRY.search(record.getMessage())
+        if match:
+            self.waits += 1
+            self.wait_seconds += float(match.group(1))
+
+
+class _Item:
+    __slots__ = ("content", "send", "future", "timing")
+
+    def __init__(self, content, send, future, timing):
+        self.content = content  # None for messages that can't be merged
+        self.send = send
+        self.future = future
+        self.timing = timing  # the queuing command's, to charge the send to
+
+
+class _ChannelQueue:
+    __slots__ = ("items", "wakeup", "task")
+
+    def __init__(self):
+        self.items = deque()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+
+class Dispatcher:
+    """Per-channel outbound queue that merges short replies into one message.
+
+    While a channel's previous message is still being sent (or waiting out a
+    rate limit), new plain-text replies queue up; the next send joins as many
+    of them as fit in Discord's 2000 character limit. An idle channel sends
+    immediately unless ``linger`` is set. Messages with embeds, files or other
+    options are sent on their own but keep their place in the queue.
+    """
+
+    def __init__(self, linger=0.0, idle_timeout=30.0):
+        self.linger = linger
+        self.idle_timeout = idle_timeout
+        self.logger = logging.getLogger('discord.dispatch')
+        self.rate_limits = RateLimitLogCounter()
+        logging.getLogger('discord.http').addHandler(self.rate_limits)
+        self.stats = {"messages": 0, "sends": 0, "coalesced": 0, "reactions": 0, "failures": 0}
+        self._queues = {}
+
+    @property
+    def depth(self):
+        """Number of messages waiting to be sent across all channels."""
+        return sum(len(queue.items) for queue in self._queues.values())
+
+    def send(self, channel, content, send):
+        """Queue a message for ``channel``.
+
+        Args:
+            channel: Channel (anything with an ``id`` and ``send``)
+            content (str): Text to merge with neighbouring replies, or None if
+                this message must be sent on its own
+            send: Coroutine function that sends this message by itself
+
+        Returns:
+            asyncio.Future: Resolves to the :class:`discord.Message` the
+            content ended up in
+        """
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = _ChannelQueue()
+        future = asyncio.get_running_loop().create_future()
+        queue.items.append(_Item(content, send, future, CommandStats.current_timing()))
+        queue.wakeup.set()
+        self.stats["messages"] += 1
+        if queue.task is None:
+            # A fresh context, so the worker's requests aren't all timed as
+            # the command that happened to start it; see the timing below
+            queue.task = asyncio.create_task(self._worker(channel, queue), context=contextvars.Context())
+        return future
+
+    def _take_batch(self, queue):
+        first = queue.items.popleft()
+        batch = [first]
+        if first.content is None:
+            return batch
+        length = len(first.content)
+        while queue.items:
+            item = queue.items[0]
+            if item.content is None or length + 1 + len(item.content) > MAX_MESSAGE_LENGTH:
+                break
+            length += 1 + len(item.content)
+            batch.append(queue.items.popleft())
+        return batch
+
+    async def _worker(self, channel, queue):
+        try:
+            while True:
+                if not queue.items:
+                    queue.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(queue.wakeup.wait(), self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        if not queue.items:
+                            return
+                if self.linger:
+                    await asyncio.sleep(self.linger)
+
+                batch = self._take_batch(queue)
+                start = time.perf_counter()
+                try:
+                    if len(batch) == 1:
+                        message = await batch[0].send()
+                    else:
+                        message = await channel.send("\n".join(item.content for item in batch))
+                        self.stats["coalesced"] += len(batch) - 1
+                except Exception as error:
+                    self._charge(batch, time.perf_counter() - start)
+                    self.stats["failures"] += 1
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(error)
+                    continue
+                self._charge(batch, time.perf_counter() - start)
+                self.stats["sends"] += 1
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_result(message)
+        finally:
+            if self._queues.get(channel.id) is queue:
+                del self._queues[channel.id]
+            for item in queue.items:
+                item.future.cancel()
+
+    @staticmethod
+    def _charge(batch, seconds):
+        # Every command in a merged send waited for all of it
+        for item in batch:
+            CommandStats.add_api_time(item.timing, seconds)
+
+    def add_reactions(self, message, emojis):
+        """Add ``emojis`` to ``message`` in order, in the background."""
+        return asyncio.create_task(self._react(message, list(emojis)))
+
+    async def _react(self, message, emojis):
+        for emoji in emojis:
+            try:
+                await message.add_reaction(emoji)
+                self.stats["reactions"] += 1
+            except Exception:
+                self.stats["failures"] += 1
+                self.logger.exception(f"Failed to add reaction {emoji} to message {message.id}")
+
+    def collect(self):
+        """Metrics collector for :class:`metrics.MetricsRegistry`."""
+        samples = [("dispatch_total", {"kind": kind}, value) for kind, value in self.stats.items()]
+        return [
+            ("dispatch_total", "counter", "Outbound messages, sends, merges, reactions and failures", samples),
+            gauge("dispatch_queue_depth", "Messages waiting to be sent", self.depth),
+            counter("discord_rate_limit_waits_total", "429 responses discord.py waited out", self.rate_limits.waits),
+            counter("discord_rate_limit_wait_seconds_total", "Seconds spent waiting out 429 responses",
+                    self.rate_limits.wait_seconds),
+        ]
+
+
+class CoalescingContext(commands.Context):
+    """Context whose ``send`` goes through the bot's :class:`Dispatcher`, if it has one."""
+
+    async def send(self, content=None, **kwargs):
+        dispatcher = getattr(self.bot, "dispatcher", None)
+        if dispatcher is None:
+            return await super().send(content, **kwargs)
+
+        send = super().send
+
+        async def send_alone():
+            return await send(content, **kwargs)
+
+        mergeable = str(content) if content is not None and not kwargs else None
+        return await dispatcher.send(self.channel, mergeable, send_alone)
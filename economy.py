@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import time
+
+from inventory import ItemCatalogue, add_item, migrate_inventory, remove_item
+from market_book import Market
+from orders import BUY, Exchange
+from ranking import LeaderboardIndex
+
+FILES = ("users.json", "market.json", "boost.json", "orders.json")
+DEFAULT_BOOST = {"multiplier": 1, "spins_left": 0}
+# Written once the top-level files are known to hold the home guild's and DM
+# data rather than a single guild's data from before economies were split
+LAYOUT_FILE = "economy.json"
+
+
+class UnassignedDataError(RuntimeError):
+    """The top-level files hold pre-split guild data and HOME_GUILD_ID isn't set."""
+
+
+class Economy:
+    """One guild's accounts, market, order books, boost and leaderboard."""
+
+    def __init__(self, manager, key, prefix, users, market, boost, orders=None):
+        self.manager = manager
+        self.key = key
+        self.prefix = prefix
+        self.users = users
+        self.market = market
+        self.orders = orders if orders is not None else Exchange()
+        self.boost = boost
+        self.leaderboard = LeaderboardIndex(users)
+        self.last_used = time.monotonic()
+
+    def path(self, filename):
+        return os.path.join(self.prefix, filename) if self.prefix else filename
+
+    def data(self, filename):
+        return {
+            "users.json": self.users,
+            "market.json": self.market.listings,
+            "boost.json": self.boost,
+            "orders.json": self.orders.orders,
+        }[filename]
+
+    def save(self, filename, key=None):
+        """Mark ``filename`` (one of FILES) of this guild dirty."""
+        self.last_used = time.monotonic()
+        self.manager.save_json(self.path(filename), self.data(filename), key)
+
+    def account(self, user_id):
+        # Every credit change goes through here so the leaderboard index stays current
+        if user_id not in self.users:
+            self.users[user_id] = {"credits": 0, "inventory": {}}
+            self.leaderboard.update(user_id, 0)
+        return self.users[user_id]
+
+    def set_credits(self, user_id, amount):
+        self.account(user_id)["credits"] = amount
+        self.leaderboard.update(user_id, amount)
+        self.save("users.json", user_id)
+
+    def add_credits(self, user_id, delta):
+        self.set_credits(user_id, self.account(user_id)["credits"] + delta)
+
+    def item_id(self, name):
+        """Catalogue ID for the item ``name``, adding it to the catalogue if it's new."""
+        catalogue = self.manager.catalogue
+        item_id, created = catalogue.intern(name)
+        if created:
+            self.manager.save_json("items.json", catalogue.names, item_id)
+        return item_id
+
+    def give_item(self, user_id, name, count=1):
+        add_item(self.account(user_id), self.item_id(name), count)
+        self.save("users.json", user_id)
+
+    def place_order(self, user_id, item_id, side, price, quantity):
+        """
+        Escrow a limit order and trade it against the item's order book.
+
+        A buy order escrows ``price * quantity`` credits and a sell order
+        the items themselves; the escrow pays for the fills and whatever is
+        left stays escrowed while the order rests on the book. Fills happen
+        at the resting order's price, so a buyer who bid above it gets the
+        difference back.
+
+        Args:
+            user_id (str): Who places the order
+            item_id (str): Catalogue ID of the item
+            side (str): orders.BUY or orders.SELL
+            price (int): Limit price per item
+            quantity (int): Number of items
+
+        Returns:
+            tuple: (resting order ID or None, fills as returned by
+            :meth:`orders.Exchange.match`), or None if the user can't cover
+            the escrow
+        """
+        record = self.account(user_id)
+        if side == BUY:
+            if record["credits"] < price * quantity:
+                return None
+            self.add_credits(user_id, -price * quantity)
+        else:
+            if not remove_item(record, item_id, quantity):
+                return None
+            self.save("users.json", user_id)
+
+        order_id, fills = self.orders.match(user_id, item_id, side, price, quantity)
+        for resting_id, counterparty, traded, trade_price in fills:
+            buyer, seller = (user_id, counterparty) if side == BUY else (counterparty, user_id)
+            if side == BUY and price > trade_price:
+                self.add_credits(buyer, (price - trade_price) * traded)
+            add_item(self.account(buyer), item_id, traded)
+            self.save("users.json", buyer)
+            self.add_credits(seller, trade_price * traded)
+            self.save("orders.json", resting_id)
+        if order_id is not None:
+            self.save("orders.json", order_id)
+        return order_id, fills
+
+    def cancel_order(self, order_id):
+        """Take an order off the book and return its escrow. Returns the cancelled order, or None."""
+        order = self.orders.cancel(order_id)
+        if order is None:
+            return None
+        if order["s"] == BUY:
+            self.add_credits(order["u"], order["p"] * order["q"])
+        else:
+            add_item(self.account(order["u"]), order["i"], order["q"])
+            self.save("users.json", order["u"])
+        self.save("orders.json", str(order_id))
+        return order
+
+    def lock(self, *keys):
+        """Hold the account locks for ``keys`` (user or listing IDs) in this guild."""
+        return self.manager.locks.hold(*(f"{self.key}:{key}" for key in keys))
+
+
+class EconomyManager:
+    """Loads each guild's economy on first use and evicts idle ones.
+
+    Guild ``<id>`` is stored as ``guilds/<id>/users.json``, ``market.json``
+    and ``boost.json``; the top-level files belong to ``home_guild_id`` (the
+    guild the bot was run in before economies were split) and to DMs. The
+    item catalogue (items.json) is shared. Loading runs in a worker thread,
+    and an economy that hasn't been used for ``idle_timeout`` seconds and has
+    nothing left to flush is dropped from memory, so memory and flush work
+    follow the guilds that are active rather than every guild ever seen.
+    ``idle_timeout`` must be far longer than any command takes.
+    """
+
+    def __init__(self, store, save_json, locks, home_guild_id=None, directory="guilds", idle_timeout=1800):
+        self.store = store
+        self.save_json = save_json
+        self.locks = locks
+        self.home_guild_id = str(home_guild_id) if home_guild_id else None
+        self.directory = directory
+        self.idle_timeout = idle_timeout
+        self.catalogue = ItemCatalogue()
+        self.layout = {}
+        self.logger = logging.getLogger('discord.economy')
+        self.stats = {"loads": 0, "evictions": 0}
+        self._economies = {}
+        self._loading = {}
+        self._task = None
+
+    def __len__(self):
+        return len(self._economies)
+
+    def __iter__(self):
+        return iter(list(self._economies.values()))
+
+    def key(self, guild):
+        """Partition key for ``guild``: its ID, or "" for the home guild and DMs."""
+        if guild is None or str(guild.id) == self.home_guild_id:
+            return ""
+        return str(guild.id)
+
+    def read(self, key):
+        """Load and index one economy from storage. Runs in a worker thread."""
+        prefix = os.path.join(self.directory, key) if key else ""
+        load = self.store.backend.load
+        users = load(os.path.join(prefix, "users.json"), {})
+        market = Market(load(os.path.join(prefix, "market.json"), {}))  # Old list-format files get IDs assigned on load
+        boost = load(os.path.join(prefix, "boost.json"), {}) or dict(DEFAULT_BOOST)
+        orders = Exchange(load(os.path.join(prefix, "orders.json"), {}))
+        return Economy(self, key, prefix, users, market, boost, orders)
+
+    def read_home(self):
+        """
+        Load the top-level economy (the home guild's and DMs'). Runs in a worker thread.
+
+        Raises:
+            UnassignedDataError: The files hold data from before economies were
+                split per guild and HOME_GUILD_ID doesn't say which guild it was
+        """
+        self.layout = self.store.backend.load(LAYOUT_FILE, {})
+        home = self.read("")
+        legacy = not self.layout.get("split") and (home.users or home.market.listings or home.orders)
+        if legacy and self.home_guild_id is None:
+            # Without it the guild these accounts came from would start over from scratch
+            raise UnassignedDataError(
+                "users.json/market.json hold data from before economies were split per guild: "
+                "set HOME_GUILD_ID to that guild's ID (or to \"dm\" to keep it for DMs only)"
+            )
+        return home
+
+    def install(self, economy):
+        """Make a loaded economy live. Runs on the event loop."""
+        for filename in FILES:
+            self.store.register(economy.path(filename), economy.data(filename))
+        if economy.market.migrated:
+            self.store.mark_dirty(economy.path("market.json"))
+        # Inventories used to be lists of item names, convert them to counts
+        if any([migrate_inventory(record, self.catalogue) for record in economy.users.values()]):
+            self.store.mark_dirty("items.json")
+            self.store.mark_dirty(economy.path("users.json"))
+        if economy.key == "" and not self.layout.get("split"):
+            # From now on whatever is written here is this layout's, DM accounts included
+            self.layout["split"] = 1
+            self.save_json(LAYOUT_FILE, self.layout)
+        self._economies[economy.key] = economy
+        self.stats["loads"] += 1
+        return economy
+
+    async def get(self, guild):
+        """Return ``guild``'s economy, loading it if needed."""
+        key = self.key(guild)
+        economy = self._economies.get(key)
+        if economy is None:
+            # Concurrent commands in a guild that isn't loaded yet share one load
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = asyncio.ensure_future(self._load(key))
+            economy = await asyncio.shield(loading)
+        economy.last_used = time.monotonic()
+        return economy
+
+    async def _load(self, key):
+        try:
+            return self.install(await asyncio.to_thread(self.read, key))
+        finally:
+            del self._loading[key]
+
+    def evict_idle(self, now=None):
+        """Drop economies idle for ``idle_timeout`` whose changes are all on disk."""
+        if self.store.flushing:
+            return 0
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        for key, economy in list(self._economies.items()):
+            if key == "" or now - economy.last_used < self.idle_timeout:
+                continue
+            paths = [economy.path(filename) for filename in FILES]
+            if any(self.store.is_dirty(path) for path in paths):
+                continue  # evicted on a later sweep, once flushed
+            for path in paths:
+                self.store.unregister(path)
+            del self._economies[key]
+            evicted += 1
+        if evicted:
+            self.stats["evictions"] += evicted
+            self.logger.debug(f"Evicted {evicted} idle guild economies")
+        return evicted
+
+    def start(self):
+        """Start sweeping idle economies on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(min(60, self.idle_timeout))
+            try:
+                self.evict_idle()
+            except Exception:
+                self.logger.exception("Evicting idle economies failed")
@@ -0,0 +1,108 @@
+import platform
+
+import discord
+
+
+class EmbedCache:
+    """Pre-built embeds for ``!help`` and ``!info``.
+
+    Everything is keyed by the command prefix, the set of loaded cogs and
+    the number of registered commands, so loading or unloading a cog (or
+    changing the prefix) rebuilds the embeds on the next request. Until then
+    ``!help`` and ``!help <command>`` are a dict lookup. Per-request parts
+    (the footer, uptime, server count) are added to a copy.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.stats = {"hits": 0, "builds": 0}
+        self._key = None
+        self._overview = None
+        self._pages = {}
+        self._info = None
+
+    def _current_key(self):
+        return (str(self.bot.command_prefix), frozenset(self.bot.cogs), len(self.bot.all_commands))
+
+    def invalidate(self):
+        self._key = None
+
+    def _ensure(self):
+        key = self._current_key()
+        if key == self._key:
+            self.stats["hits"] += 1
+            return
+        self._key = key
+        self._build()
+        self.stats["builds"] += 1
+
+    def _build(self):
+        prefix = self.bot.command_prefix
+
+        # General help - list all commands by cog
+        embed = discord.Embed(
+            title="Bot Commands",
+            description=f"Use `{prefix}help <command>` for detailed help",
+            color=discord.Color.blue()
+        )
+        for cog_name, cog in self.bot.cogs.items():
+            # Get commands that are not hidden
+            commands_list = [f"`{prefix}{cmd.name}`" for cmd in cog.get_commands() if not cmd.hidden]
+            if commands_list:
+                embed.add_field(name=cog_name, value=", ".join(commands_list), inline=False)
+
+        # Add uncategorized commands
+        uncategorized = [f"`{prefix}{cmd.name}`" for cmd in self.bot.commands if not cmd.cog and not cmd.hidden]
+        if uncategorized:
+            embed.add_field(name="Uncategorized", value=", ".join(uncategorized), inline=False)
+        self._overview = embed
+
+        # One page per command, reachable by its name and every alias
+        self._pages = {}
+        for cmd in self.bot.walk_commands():
+            page = discord.Embed(
+                title=f"Help: {cmd.name}",
+                description=cmd.help or "No description available",
+                color=discord.Color.blue()
+            )
+            usage = f"{prefix}{cmd.qualified_name} {cmd.signature}" if cmd.signature else f"{prefix}{cmd.qualified_name}"
+            page.add_field(name="Usage", value=usage, inline=False)
+            for name in (cmd.qualified_name, *(f"{cmd.full_parent_name} {alias}".strip() for alias in cmd.aliases)):
+                self._pages[name] = page
+
+        # Built on the next !info, it needs the logged-in user
+        self._info = None
+
+    def warm(self):
+        """Build the embeds now (e.g. once the cogs are loaded and the bot is logged in)."""
+        self._ensure()
+        if self.bot.user is not None:
+            self.info()
+
+    def help_overview(self):
+        """The ``!help`` embed, without the per-request footer."""
+        self._ensure()
+        return self._overview
+
+    def help_page(self, name):
+        """The ``!help <name>`` embed, or None for an unknown command."""
+        self._ensure()
+        return self._pages.get(" ".join(name.split()))
+
+    def info(self):
+        """The static part of the ``!info`` embed."""
+        self._ensure()
+        if self._info is None:
+            embed = discord.Embed(
+                title="Bot Information",
+                description="Information about this Discord bot",
+                color=discord.Color.blue()
+            )
+            embed.add_field(name="Bot Name", value=self.bot.user.name, inline=True)
+            embed.add_field(name="Bot ID", value=self.bot.user.id, inline=True)
+            embed.add_field(name="Discord.py Version", value=discord.__version__, inline=True)
+            embed.add_field(name="Python Version", value=platform.python_version(), inline=True)
+            embed.add_field(name="Platform", value=platform.system(), inline=True)
+            embed.add_field(name="Prefix", value=self.bot.command_prefix, inline=True)
+            self._info = embed
+        return self._info
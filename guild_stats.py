@@ -0,0 +1,109 @@
+import logging
+
+import discord
+
+
+class GuildStats:
+    """Member and channel counts for one guild."""
+
+    __slots__ = ("bots", "text_channels", "voice_channels", "categories")
+
+    def __init__(self, bots=0, text_channels=0, voice_channels=0, categories=0):
+        self.bots = bots
+        self.text_channels = text_channels
+        self.voice_channels = voice_channels
+        self.categories = categories
+
+    @classmethod
+    def count(cls, guild):
+        """Count everything from scratch (O(members + channels))."""
+        return cls(
+            bots=sum(1 for member in guild.members if member.bot),
+            text_channels=len(guild.text_channels),
+            voice_channels=len(guild.voice_channels),
+            categories=len(guild.categories),
+        )
+
+    def as_tuple(self):
+        return (self.bots, self.text_channels, self.voice_channels, self.categories)
+
+
+def _channel_field(channel):
+    # Same classification as guild.text_channels / voice_channels / categories
+    if isinstance(channel, discord.TextChannel):
+        return "text_channels"
+    if isinstance(channel, discord.VoiceChannel):
+        return "voice_channels"
+    if isinstance(channel, discord.CategoryChannel):
+        return "categories"
+    return None
+
+
+class GuildStatsCache:
+    """Per-guild counts kept current from gateway events.
+
+    A guild's stats are counted once, the first time they're asked for, and
+    then adjusted on member join/leave and channel create/delete/update, so
+    reading them is O(1). Events can be missed (reconnects, members that
+    weren't cached), so :meth:`reconcile` recounts every guild periodically
+    and corrects any drift.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('discord.guild_stats')
+        self.stats = {"hits": 0, "builds": 0, "reconciled": 0, "drifted": 0}
+        self._guilds = {}
+
+    def get(self, guild):
+        stats = self._guilds.get(guild.id)
+        if stats is None:
+            stats = self._guilds[guild.id] = GuildStats.count(guild)
+            self.stats["builds"] += 1
+        else:
+            self.stats["hits"] += 1
+        return stats
+
+    def forget(self, guild):
+        self._guilds.pop(guild.id, None)
+
+    def member_joined(self, member):
+        stats = self._guilds.get(member.guild.id)
+        if stats is not None and member.bot:
+            stats.bots += 1
+
+    def member_left(self, member):
+        stats = self._guilds.get(member.guild.id)
+        if stats is not None and member.bot:
+            stats.bots = max(stats.bots - 1, 0)
+
+    def channel_created(self, channel, delta=1):
+        stats = self._guilds.get(channel.guild.id)
+        field = _channel_field(channel)
+        if stats is not None and field is not None:
+            setattr(stats, field, max(getattr(stats, field) + delta, 0))
+
+    def channel_deleted(self, channel):
+        self.channel_created(channel, -1)
+
+    def channel_updated(self, before, after):
+        # A text channel converted to a news channel stays a TextChannel, but
+        # handle any type change the same way
+        if _channel_field(before) != _channel_field(after):
+            self.channel_deleted(before)
+            self.channel_created(after)
+
+    def reconcile(self, guilds):
+        """Recount ``guilds`` that are cached and fix drift. Returns how many had drifted."""
+        drifted = 0
+        for guild in guilds:
+            cached = self._guilds.get(guild.id)
+            if cached is None:
+                continue
+            fresh = GuildStats.count(guild)
+            if fresh.as_tuple() != cached.as_tuple():
+                drifted += 1
+                self.logger.debug(f"Guild {guild.id} stats drifted: {cached.as_tuple()} -> {fresh.as_tuple()}")
+            self._guilds[guild.id] = fresh
+        self.stats["reconciled"] += 1
+        self.stats["drifted"] += drifted
+        return drifted
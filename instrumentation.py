@@ -0,0 +1,178 @@
+import bisect
+import contextvars
+import functools
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+PHASES = ("total", "handler", "storage", "api")
+
+_current = contextvars.ContextVar("command_timing", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus style, non-cumulative internally)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return BUCKETS[-1]
+
+    def cumulative(self):
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            yield bound, seen
+
+
+class CommandRecord:
+    """Everything recorded about one command."""
+
+    __slots__ = ("histograms", "calls", "errors", "_slots", "_seconds")
+
+    WINDOW = 60
+
+    def __init__(self):
+        self.histograms = {phase: Histogram() for phase in PHASES}
+        self.calls = 0
+        self.errors = 0
+        # Calls per second over the last WINDOW seconds, as a ring buffer
+        self._slots = [0] * self.WINDOW
+        self._seconds = [-1] * self.WINDOW
+
+    def hit(self):
+        now = int(time.monotonic())
+        i = now % self.WINDOW
+        if self._seconds[i] != now:
+            self._seconds[i] = now
+            self._slots[i] = 0
+        self._slots[i] += 1
+        self.calls += 1
+
+    def rate(self):
+        """Calls per second over the last minute."""
+        now = int(time.monotonic())
+        recent = sum(count for count, second in zip(self._slots, self._seconds) if now - second < self.WINDOW)
+        return recent / self.WINDOW
+
+
+class _Timing:
+    __slots__ = ("start", "storage", "api")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.storage = 0.0
+        self.api = 0.0
+
+
+class CommandStats:
+    """Per-command latency, error and rate instrumentation.
+
+    :meth:`install` hooks the bot's before/after-invoke hooks and wraps its
+    HTTP client so time spent in Discord REST calls is attributed to the
+    command that made them; storage time is reported through
+    :meth:`add_storage_time`. Recording is a few ``perf_counter`` calls and
+    dict lookups per command.
+    """
+
+    def __init__(self):
+        self.commands = {}
+
+    def install(self, bot):
+        bot.before_invoke(self._before)
+        bot.after_invoke(self._after)
+
+        request = bot.http.request
+
+        @functools.wraps(request)
+        async def timed_request(*args, **kwargs):
+            timing = _current.get()
+            if timing is None:
+                return await request(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await request(*args, **kwargs)
+            finally:
+                timing.api += time.perf_counter() - start
+
+        bot.http.request = timed_request
+
+    async def _before(self, ctx):
+        _current.set(_Timing())
+
+    async def _after(self, ctx):
+        timing = _current.get()
+        if timing is None:
+            return
+        _current.set(None)
+        total = time.perf_counter() - timing.start
+        self.record(ctx.command.qualified_name, total, timing.storage, timing.api, ctx.command_failed)
+
+    def record(self, name, total, storage, api, failed=False):
+        record = self.commands.get(name)
+        if record is None:
+            record = self.commands[name] = CommandRecord()
+        record.hit()
+        if failed:
+            record.errors += 1
+        histograms = record.histograms
+        histograms["total"].observe(total)
+        histograms["handler"].observe(max(total - storage - api, 0.0))
+        histograms["storage"].observe(storage)
+        histograms["api"].observe(api)
+
+    @staticmethod
+    def add_storage_time(seconds):
+        """Attribute ``seconds`` of storage work to the running command, if any."""
+        timing = _current.get()
+        if timing is not None:
+            timing.storage += seconds
+
+    @staticmethod
+    def current_timing():
+        """The running command's timing, for work done on its behalf in another task (or None)."""
+        return _current.get()
+
+    @staticmethod
+    def add_api_time(timing, seconds):
+        """Attribute ``seconds`` of Discord API time to a timing from :meth:`current_timing`."""
+        if timing is not None:
+            timing.api += seconds
+
+    def collect(self):
+        """Metrics collector for :class:`metrics.MetricsRegistry`."""
+        calls, errors, histogram_samples = [], [], []
+        for name, record in self.commands.items():
+            calls.append(("command_calls_total", {"command": name}, record.calls))
+            errors.append(("command_errors_total", {"command": name}, record.errors))
+            for phase, histogram in record.histograms.items():
+                labels = {"command": name, "phase": phase}
+                for bound, seen in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    histogram_samples.append(("command_latency_seconds_bucket", {**labels, "le": le}, seen))
+                histogram_samples.append(("command_latency_seconds_sum", labels, histogram.total))
+                histogram_samples.append(("command_latency_seconds_count", labels, histogram.count))
+        return [
+            ("command_calls_total", "counter", "Command invocations", calls),
+            ("command_errors_total", "counter", "Command invocations that raised", errors),
+            ("command_latency_seconds", "histogram", "Command latency by phase", histogram_samples),
+        ]
@@ -0,0 +1,80 @@
+class ItemCatalogue:
+    """Shared table of item names, each interned to a small ID.
+
+    ``names`` maps item IDs (as strings, so it can be stored as JSON) to item
+    names and is what gets persisted; the reverse index is rebuilt on load.
+    """
+
+    def __init__(self, names=None):
+        self.names = names if names is not None else {}
+        self._ids = {name: item_id for item_id, name in self.names.items()}
+        self._next_id = max((int(i) for i in self.names), default=0) + 1
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, name):
+        """Return the ID for ``name``, or None if it was never interned."""
+        return self._ids.get(name)
+
+    def intern(self, name):
+        """Return the ID for ``name``, assigning a new one if needed.
+
+        Returns:
+            tuple: ``(item_id, created)`` where ``created`` says whether the
+            catalogue changed and needs saving
+        """
+        item_id = self._ids.get(name)
+        if item_id is not None:
+            return item_id, False
+        item_id = str(self._next_id)
+        self._next_id += 1
+        self.names[item_id] = name
+        self._ids[name] = item_id
+        return item_id, True
+
+    def name(self, item_id):
+        return self.names.get(item_id, "unknown item")
+
+
+def migrate_inventory(record, catalogue):
+    """Convert a list-of-names inventory to ``{item_id: count}`` in place.
+
+    Returns:
+        bool: True if the record was changed
+    """
+    items = record.get("inventory")
+    if isinstance(items, dict):
+        return False
+    counts = {}
+    for name in items or ():
+        item_id, _ = catalogue.intern(name)
+        counts[item_id] = counts.get(item_id, 0) + 1
+    record["inventory"] = counts
+    return True
+
+
+def add_item(record, item_id, count=1):
+    inventory = record.setdefault("inventory", {})
+    inventory[item_id] = inventory.get(item_id, 0) + count
+
+
+def remove_item(record, item_id, count=1):
+    """Take ``count`` of an item out of the inventory.
+
+    Returns:
+        bool: False (and nothing is removed) if there weren't enough
+    """
+    inventory = record.get("inventory", {})
+    held = inventory.get(item_id, 0)
+    if held < count:
+        return False
+    if held == count:
+        del inventory[item_id]
+    else:
+        inventory[item_id] = held - count
+    return True
+
+
+def count_item(record, item_id):
+    return record.get("inventory", {}).get(item_id, 0)
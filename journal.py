@@ -0,0 +1,377 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def _name(filename):
+    # "users.json" -> "users", "guilds/123/users.json" -> "guilds/123/users"
+    return os.path.splitext(os.path.normpath(filename))[0].replace(os.sep, "/")
+
+
+def apply_entry(state, entry):
+    """Apply one journal entry to ``state`` (a dict of data set name -> data)."""
+    name = entry["f"]
+    if "k" not in entry:
+        state[name] = entry["v"]
+    elif "v" in entry:
+        state.setdefault(name, {})[entry["k"]] = entry["v"]
+    else:
+        state.get(name, {}).pop(entry["k"], None)
+
+
+def _segments(directory):
+    return sorted(glob.glob(os.path.join(directory, "journal-*.log")))
+
+
+def _snapshots(directory):
+    return sorted(glob.glob(os.path.join(directory, "snapshot-*.json")))
+
+
+def _segment_start(path):
+    return int(os.path.basename(path)[len("journal-"):-len(".log")])
+
+
+def _truncate_torn_tail(path):
+    """Cut a half-written last line (left by a crash mid-append) off a segment.
+
+    Returns:
+        int: Number of bytes removed
+    """
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(position - 65536, 0)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            position = start
+        else:
+            keep = 0
+        if keep < end:
+            f.truncate(keep)
+            f.flush()
+            os.fsync(f.fileno())
+        return end - keep
+
+
+def _group(name):
+    # Data sets loaded together: "guilds/123/users" -> "guilds/123/", "users" -> ""
+    return name.rpartition("/")[0] + "/" if "/" in name else ""
+
+
+def replay(directory, until=None, select=None, seen=None):
+    """Rebuild economy state from snapshots and journal segments.
+
+    Args:
+        directory (str): Journal directory
+        until (float): Unix timestamp to stop at, or None for the latest state
+        select: Function of a data set name saying whether to rebuild it, or
+            None for all of them
+        seen (set): If given, the name of every data set found is added to it
+
+    Returns:
+        tuple: ``(state, seq, entries_replayed)`` where ``state`` maps data set
+        names ("users", "market", "boost", "guilds/<id>/users", ...) to their data
+
+    Raises:
+        ValueError: ``until`` is before the oldest history that is kept
+    """
+    state, seq = {}, 0
+    snapshots = _snapshots(directory)
+    segments = _segments(directory)
+    for path in reversed(snapshots):
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+        if until is None or snapshot["t"] <= until:
+            state, seq = snapshot["data"], snapshot["seq"]
+            if seen is not None:
+                seen.update(state)
+            if select is not None:
+                state = {name: data for name, data in state.items() if select(name)}
+            break
+    else:
+        # Replaying from nothing is only right if the journal starts from
+        # nothing: its first segment is kept and it wasn't seeded from JSON files
+        first = os.path.join(directory, f"journal-{0:012d}.log")
+        seeded = os.path.join(directory, f"snapshot-{0:012d}.json")
+        if snapshots and (first not in segments or seeded in snapshots):
+            raise ValueError(f"History before {datetime.fromtimestamp(snapshot['t']).isoformat()} isn't kept")
+
+    replayed = 0
+    for i, path in enumerate(segments):
+        # Segments are named after the seq they start at, skip those the snapshot covers
+        if i + 1 < len(segments) and _segment_start(segments[i + 1]) <= seq:
+            continue
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can leave a half-written last line behind
+                    break
+                if entry["s"] <= seq:
+                    continue
+                if until is not None and entry["t"] > until:
+                    return state, seq, replayed
+                if seen is not None:
+                    seen.add(entry["f"])
+                if select is None or select(entry["f"]):
+                    apply_entry(state, entry)
+                seq = entry["s"]
+                replayed += 1
+    return state, seq, replayed
+
+
+class JournalBackend:
+    """Append-only journal storage backend with periodic snapshots.
+
+    Every save is captured as a journal entry holding the record's new value,
+    buffered in memory, and appended to the current segment by the
+    write-behind store's flush (so one flush is one group commit). After
+    ``snapshot_every`` entries a compact snapshot of all data is written and
+    a new segment is started. Startup loads the newest snapshot and replays
+    only the entries after it.
+
+    Only the newest ``keep_snapshots`` snapshots, and the segments after the
+    oldest of them, are kept; ``python journal.py replay --at`` can go back
+    as far as that oldest snapshot.
+
+    Only top-level data sets are kept in memory from startup. The others
+    (``guilds/<id>/...``) are rebuilt from disk when first loaded, a guild's
+    at once, and dropped again by :meth:`forget` when the guild's economy is
+    evicted. Snapshots fill in the data sets that aren't in memory from disk.
+    """
+
+    def __init__(self, directory="journal", fsync="always", snapshot_every=100_000, keep_snapshots=1):
+        self.directory = directory
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        self.logger = logging.getLogger('discord.journal')
+        os.makedirs(directory, exist_ok=True)
+        self._state = None
+        self._seq = 0
+        self._since_snapshot = 0
+        self._buffer = []
+        self._unwritten = []
+        self._segment = None
+        self._names = set()  # every data set in the journal, in memory or not
+        # Held while reading or writing files: loads rebuild from (and seed
+        # into) what the flushes write
+        self._lock = threading.Lock()
+
+    def _recover(self):
+        if self._state is None:
+            segments = _segments(self.directory)
+            # New entries are appended to the last segment: a line torn by a
+            # crash would be glued to the next entry and stop every replay there
+            if segments and _truncate_torn_tail(segments[-1]):
+                self.logger.warning(f"Dropped a half-written entry at the end of {segments[-1]}")
+            self._state, self._seq, self._since_snapshot = replay(
+                self.directory, select=lambda name: not _group(name), seen=self._names,
+            )
+            self._segment = segments[-1] if segments else self._segment_path(self._seq)
+        return self._state
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"journal-{seq:012d}.log")
+
+    def load(self, filename, default):
+        """Return a data set, rebuilding it (and its group) from disk if it isn't in memory. Runs in a worker thread."""
+        state = self._recover()
+        name = _name(filename)
+        if name in state:
+            return state[name]
+        with self._lock:
+            if name in self._names:
+                group = _group(name)
+                loaded, _, _ = replay(
+                    self.directory, select=lambda other: _group(other) == group and other not in state,
+                )
+                # One update, so the event loop never sees a half-filled dict
+                state.update(loaded)
+            elif os.path.exists(filename):
+                # First start on the journal: seed it from the existing JSON file,
+                # with a snapshot of what's on disk plus this data set
+                with open(filename, "r") as f:
+                    data = json.load(f)
+                disk, seq, _ = replay(self.directory)
+                disk[name] = data
+                self._write_snapshot(seq, json.dumps(
+                    {"seq": seq, "t": time.time(), "data": disk},
+                    separators=(",", ":"),
+                ))
+                self._names.add(name)
+                state[name] = data
+        return state.get(name, default)
+
+    def forget(self, filename):
+        """Drop a data set from memory; it must have been flushed (see WriteBehindStore.unregister)."""
+        if self._state is not None:
+            self._state.pop(_name(filename), None)
+
+    def capture(self, filename, data, key):
+        """Buffer an entry for a change that was just made. Runs on the event loop."""
+        self._recover()
+        self._state[_name(filename)] = data
+        self._names.add(_name(filename))
+        self._seq += 1
+        entry = {"s": self._seq, "t": round(time.time(), 3), "f": _name(filename)}
+        if key is None:
+            entry["v"] = data
+        else:
+            entry["k"] = key
+            if key in data:
+                entry["v"] = data[key]
+        self._buffer.append(json.dumps(entry, separators=(",", ":")))
+        self._since_snapshot += 1
+
+    def prepare(self, filename, data, dirty_keys):
+        """Take the buffered entries (and maybe a snapshot). Runs on the event loop."""
+        self._state[_name(filename)] = data
+        lines, self._buffer = self._unwritten + self._buffer, []
+        self._unwritten = []
+        snapshot = None
+        if self._since_snapshot >= self.snapshot_every:
+            # Encoded here, since the data keeps changing on the event loop;
+            # write() adds the data sets that are only on disk
+            parts = {name: json.dumps(data, separators=(",", ":")) for name, data in list(self._state.items())}
+            snapshot = (self._seq, time.time(), parts)
+            self._since_snapshot = 0
+        payload = ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+        return (payload, snapshot)
+
+    def write(self, filename, payload):
+        """Append entries and write any snapshot. Runs in a worker thread."""
+        with self._lock:
+            return self._write(payload)
+
+    def _write(self, payload):
+        lines, snapshot = payload
+        written = 0
+        if lines:
+            try:
+                with open(self._segment, "ab") as f:
+                    f.write(lines)
+                    if self.fsync == "always":
+                        f.flush()
+                        os.fsync(f.fileno())
+            except OSError:
+                # Keep the entries for the next flush instead of losing them
+                self._unwritten = lines.decode("utf-8").splitlines()
+                raise
+            written += len(lines)
+
+        if snapshot is not None:
+            seq, t, parts = snapshot
+            # Data sets not in memory haven't changed since they were last on disk
+            disk, _, _ = replay(self.directory, select=lambda name: name not in parts)
+            parts.update((name, json.dumps(data, separators=(",", ":"))) for name, data in disk.items())
+            data = ",".join(f"{json.dumps(name)}:{part}" for name, part in parts.items())
+            body = f'{{"seq":{seq},"t":{t},"data":{{{data}}}}}'
+            self._write_snapshot(seq, body)
+            self._segment = self._segment_path(seq)
+            # Create the new segment now, so the old ones count as covered below
+            open(self._segment, "ab").close()
+            self._prune()
+            written += len(body)
+        return written
+
+    def _prune(self):
+        """Delete snapshots older than the ones kept, and the segments they cover."""
+        snapshots = _snapshots(self.directory)
+        if len(snapshots) <= self.keep_snapshots:
+            return
+        for path in snapshots[:-self.keep_snapshots]:
+            os.remove(path)
+        oldest = snapshots[-self.keep_snapshots]
+        covered = int(os.path.basename(oldest)[len("snapshot-"):-len(".json")])
+        segments = _segments(self.directory)
+        # Same rule as replay: a segment is covered once the next one starts at or before the snapshot
+        for path, following in zip(segments, segments[1:]):
+            if _segment_start(following) <= covered:
+                os.remove(path)
+
+    def _write_snapshot(self, seq, body):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, f"snapshot-{seq:012d}.json"))
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _bench(entries, users):
+    """Write a synthetic journal of ``entries`` credit changes and time replaying it."""
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        with open(os.path.join(directory, "journal-000000000000.log"), "w") as f:
+            now = time.time()
+            for seq in range(1, entries + 1):
+                user_id = str(seq % users)
+                record = {"credits": seq, "inventory": []}
+                entry = {"s": seq, "t": now, "f": "users", "k": user_id, "v": record}
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        size = os.path.getsize(f.name)
+        print(f"Wrote {entries:,} entries ({size / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        state, seq, replayed = replay(directory)
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {replayed:,} entries into {len(state['users']):,} users in {elapsed:.2f}s "
+              f"({replayed / elapsed:,.0f} entries/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and replay the economy journal.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = sub.add_parser("replay", help="rebuild state, optionally as of a timestamp")
+    rebuild.add_argument("--dir", default="journal", help="journal directory")
+    rebuild.add_argument("--at", type=_parse_time, help="unix timestamp or ISO date/time to stop at")
+    rebuild.add_argument("--out", help="directory to write users.json/market.json/boost.json into")
+
+    bench = sub.add_parser("bench", help="measure replay speed on a synthetic journal")
+    bench.add_argument("--entries", type=int, default=1_000_000)
+    bench.add_argument("--users", type=int, default=100_000)
+
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        _bench(args.entries, args.users)
+        return
+
+    start = time.perf_counter()
+    try:
+        state, seq, replayed = replay(args.dir, until=args.at)
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+    print(f"Rebuilt state at seq {seq} ({replayed:,} entries replayed in {elapsed:.2f}s)")
+    for name, data in state.items():
+        print(f"  {name}: {len(data):,} records")
+        if args.out:
+            path = os.path.join(args.out, f"{name}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(data, f, indent=4)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
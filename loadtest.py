@@ -0,0 +1,269 @@
+"""Offline load test for the economy commands in main.py.
+
+Runs the real command callbacks against stand-in Discord objects (no
+gateway connection or token needed) from thousands of synthetic users, and
+reports throughput, latency percentiles and how much the storage layer
+wrote. It runs in a scratch directory, so the bot's real data files are
+never touched::
+
+    python loadtest.py --users 5000 --operations 50000 --concurrency 200
+    STORAGE_BACKEND=sqlite python loadtest.py --mix spin=5,pay=3,leaderboard=1
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Channel IDs the channel-restricted commands check for (see main.py)
+SPIN_CHANNEL_ID = 1368871928961568779
+GAMBLE_CHANNEL_ID = 1369554651627782214
+OTHER_CHANNEL_ID = 1
+
+DEFAULT_MIX = "spin=30,credits=15,pay=15,work=5,gamble=5,additem=5,buy=10,marketlist=5,inventory=4,leaderboard=4,rank=2"
+
+
+class FakeMember:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.roles = []
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeMessage:
+    def __init__(self, author, channel, content):
+        self.author = author
+        self.channel = channel
+        self.content = content
+
+
+class FakeGuild:
+    """Guild whose member cache holds some of the synthetic users."""
+
+    def __init__(self, guild_id, members):
+        self.id = guild_id
+        self.members = members
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+
+class FakeContext:
+    """Just enough of ``commands.Context`` for the economy commands."""
+
+    def __init__(self, harness, author, channel):
+        self.harness = harness
+        self.author = author
+        self.channel = channel
+        self.guild = random.choice(harness.guilds)
+        self.bot = harness.bot
+
+    async def send(self, content=None, **kwargs):
+        await self.harness.api_call()
+        self.harness.messages += 1
+        self.harness.message_chars += len(content or "")
+        prompts = self.harness.main.prompts
+        if prompts.is_waiting(self.channel.id, self.author.id):
+            # gamble asked for an amount: answer it straight away
+            reply = FakeMessage(self.author, self.channel, str(random.randint(1, 500)))
+            asyncio.get_running_loop().call_soon(prompts.feed, reply)
+        return FakeMessage(self.bot.user, self.channel, content)
+
+
+class Harness:
+    def __init__(self, main, users, guilds, listings, api_latency, cached_members):
+        self.main = main
+        self.bot = main.bot
+        self.users = [FakeMember(100_000 + i) for i in range(users)]
+        cached = {member.id: member for member in self.users[:cached_members]}
+        # Guild 1 is the home guild that owns the seeded data files
+        self.guilds = [FakeGuild(guild_id, cached) for guild_id in range(1, guilds + 1)]
+        self.listings = max(listings, 1)
+        self.api_latency = api_latency
+        self.api_calls = 0
+        self.messages = 0
+        self.message_chars = 0
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+
+        # Replace the calls that would go to Discord
+        self.bot.fetch_user = self.fetch_user
+
+    async def api_call(self):
+        self.api_calls += 1
+        if self.api_latency:
+            await asyncio.sleep(random.expovariate(1 / self.api_latency))
+
+    async def fetch_user(self, user_id):
+        await self.api_call()
+        return FakeMember(user_id)
+
+    def context(self, channel_id, author=None):
+        return FakeContext(self, author or random.choice(self.users), FakeChannel(channel_id))
+
+    def operation(self, name):
+        """Build the coroutine for one call of command ``name`` with random arguments."""
+        main = self.main
+        if name == "spin":
+            return main.spin.callback(self.context(SPIN_CHANNEL_ID), random.choice((1, 1, 1, 5, 25)))
+        if name == "work":
+            return main.work.callback(self.context(SPIN_CHANNEL_ID))
+        if name == "gamble":
+            return main.gamble.callback(self.context(GAMBLE_CHANNEL_ID))
+        if name == "pay":
+            return main.pay.callback(self.context(OTHER_CHANNEL_ID), random.choice(self.users), random.randint(1, 1000))
+        if name == "additem":
+            item = f"item{random.randint(1, 200)}"
+            return main.additem.callback(self.context(OTHER_CHANNEL_ID), item, random.randint(1, 5000))
+        if name == "buy":
+            # Seeded listing IDs, some of which will have been sold already
+            return main.buy.callback(self.context(OTHER_CHANNEL_ID), random.randint(1, self.listings))
+        if name == "marketlist":
+            return main.marketlist.callback(self.context(OTHER_CHANNEL_ID), "page", str(random.randint(1, 5)))
+        if name == "rank":
+            return main.rank.callback(self.context(OTHER_CHANNEL_ID), None)
+        return getattr(main, name).callback(self.context(OTHER_CHANNEL_ID))
+
+    async def run(self, operations, concurrency, mix):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        remaining = iter(range(operations))
+
+        async def worker():
+            for _ in remaining:
+                name = random.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    await self.operation(name)
+                except Exception as error:
+                    self.errors[f"{name}: {type(error).__name__}"] += 1
+                self.latencies[name].append(time.perf_counter() - start)
+
+        self.main.store.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        await self.main.store.stop()
+        return elapsed
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def seed_data(directory, users, listings):
+    """Write starting users.json/market.json so reads have something to find."""
+    accounts = {
+        str(100_000 + i): {"credits": int(random.paretovariate(1.2) * 1000), "inventory": {}}
+        for i in range(users)
+    }
+    market = {
+        str(i): {"name": f"item{random.randint(1, 200)}", "price": random.randint(1, 5000),
+                 "seller": str(100_000 + random.randrange(users))}
+        for i in range(1, listings + 1)
+    }
+    for filename, data in (("users.json", accounts), ("market.json", market)):
+        with open(os.path.join(directory, filename), "w") as f:
+            json.dump(data, f)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def report(harness, elapsed, operations):
+    main = harness.main
+    print(f"{operations:,} operations in {elapsed:.2f}s: {operations / elapsed:,.0f} ops/s")
+    print()
+    print(f"{'command':<12} {'calls':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in sorted(harness.latencies.items()):
+        values.sort()
+        print(f"{name:<12} {len(values):>8,} {percentile(values, 0.5) * 1000:>8.2f} "
+              f"{percentile(values, 0.99) * 1000:>8.2f} {values[-1] * 1000:>8.2f}")
+    print()
+
+    metrics = main.store.metrics.as_dict()
+    print(f"Storage ({type(main.store.backend).__name__}): {metrics['flushes']:,} flushes, "
+          f"{metrics['bytes_written'] / 1e6:,.2f} MB written, avg flush {metrics['avg_latency_ms']} ms, "
+          f"max {metrics['max_latency_ms']} ms, {metrics['failures']} failures")
+    names = main.names
+    print(f"Discord API: {harness.api_calls:,} calls ({names.stats['api_calls']:,} fetch_user), "
+          f"{harness.messages:,} messages, {harness.message_chars / 1e6:.2f} M chars")
+    print(f"Name cache: {names.hit_rate:.1%} hit rate")
+    print(f"Economies: {len(main.economies)} loaded, {main.economies.stats['loads']} loads")
+    locks = main.account_locks.stats
+    print(f"Account locks: {locks.acquisitions:,} acquisitions, {locks.contended:,} contended")
+    if harness.errors:
+        print()
+        print("Errors:")
+        for error, count in harness.errors.most_common():
+            print(f"  {count:>8,}  {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive main.py's commands offline and measure them.")
+    parser.add_argument("--users", type=int, default=5000, help="synthetic users")
+    parser.add_argument("--guilds", type=int, default=1, help="guilds the commands are spread over")
+    parser.add_argument("--operations", type=int, default=50_000, help="commands to run")
+    parser.add_argument("--concurrency", type=int, default=100, help="commands in flight at once")
+    parser.add_argument("--listings", type=int, default=1000, help="market listings to start with")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="command weights, e.g. spin=3,pay=1")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="mean simulated Discord API latency in seconds")
+    parser.add_argument("--cached-members", type=int, default=0,
+                        help="users present in the fake guild's member cache")
+    parser.add_argument("--dir", help="data directory to use instead of a fresh temporary one")
+    parser.add_argument("--seed", type=int, help="random seed")
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    directory = args.dir or tempfile.mkdtemp(prefix="loadtest-")
+    os.makedirs(directory, exist_ok=True)
+    if not os.path.exists(os.path.join(directory, "users.json")):
+        seed_data(directory, args.users, args.listings)
+    print(f"Data directory: {directory}")
+
+    # main.py reads its data from the working directory (install_state(read_state())
+    # is what the bot's startup does, see load_state)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(directory)
+    os.environ["HOME_GUILD_ID"] = "1"
+    import main as bot_main
+    bot_main.install_state(bot_main.read_state())
+
+    harness = Harness(bot_main, args.users, args.guilds, args.listings, args.api_latency, args.cached_members)
+    elapsed = asyncio.run(harness.run(args.operations, args.concurrency, parse_mix(args.mix)))
+    report(harness, elapsed, args.operations)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+import asyncio
+import contextlib
+import time
+
+
+class LockStats:
+    """Counters for how often, and for how long, commands waited on a lock."""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait, contended):
+        self.acquisitions += 1
+        if contended:
+            self.contended += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self):
+        avg = self.total_wait / self.contended if self.contended else 0.0
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "avg_wait_ms": round(avg * 1000, 2),
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+class AccountLocks:
+    """Per-account asyncio locks for read-modify-write sections of commands.
+
+    Keys are usually user IDs, but anything sortable works (e.g.
+    ``"listing:12"``). Multi-party operations lock every key they touch in
+    sorted order, so two commands can never deadlock by taking the same
+    locks in opposite orders. Locks are dropped once nobody holds or waits
+    on them, so memory stays proportional to in-flight commands.
+    """
+
+    def __init__(self):
+        self.stats = LockStats()
+        self._locks = {}
+
+    def __len__(self):
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *keys):
+        """Hold the locks for every key in ``keys`` for the duration of the block."""
+        keys = sorted(set(keys))
+        entries = []
+        for key in keys:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            entries.append(entry)
+
+        acquired = []
+        try:
+            contended = any(lock.locked() for lock, _ in entries)
+            start = time.perf_counter()
+            for entry in entries:
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            self.stats.record(time.perf_counter() - start, contended)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for key, entry in zip(keys, entries):
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
@@ -1,46 +1,164 @@
 import os
+import copy
+import json
+import atexit
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-def setup_logger(name):
+# Queue handlers created by setup_logger in async mode, by logger name
+QUEUE_HANDLERS = {}
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler that never lets a full queue grow without bound.
+
+    Policies when the queue is full:
+        drop_new: discard the new record (the default)
+        drop_oldest: discard the oldest queued record to make room
+        block: wait up to ``timeout`` seconds for room (back-pressure), then drop
+    """
+
+    POLICIES = ("drop_new", "drop_oldest", "block")
+
+    def __init__(self, log_queue, policy="drop_new", timeout=1.0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        super().__init__(log_queue)
+        self.policy = policy
+        self.timeout = timeout
+        self.stats = {"enqueued": 0, "dropped": 0, "max_depth": 0}
+
+    def prepare(self, record):
+        # Merge the arguments now (they may change before the listener gets to
+        # them) but leave the formatting to the listener's handlers
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def enqueue(self, record):
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.timeout)
+            elif self.policy == "drop_oldest":
+                self._put_dropping_oldest(record)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return
+        self.stats["enqueued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.queue.qsize())
+
+    def _put_dropping_oldest(self, record):
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.stats["dropped"] += 1
+                except queue.Empty:
+                    pass
+
+def log_stats():
+    """
+    Counters of every async-mode logger.
+
+    Returns:
+        dict: Logger name -> {"enqueued", "dropped", "max_depth", "depth"}
+    """
+    return {name: {**handler.stats, "depth": handler.depth} for name, handler in QUEUE_HANDLERS.items()}
+
+def setup_logger(name, async_mode=None, queue_size=None, policy=None, json_lines=None):
     """
     Set up a logger with console and file handlers.
-    
+
+    In async mode the logger only puts records on a bounded queue and a
+    background thread does the formatting, console writes and file
+    rotation, so logging from a coroutine never blocks the event loop.
+    Each option defaults to its environment variable.
+
     Args:
         name (str): Name of the logger
-        
+        async_mode (bool): Log through a queue (LOG_ASYNC, default off)
+        queue_size (int): Maximum queued records (LOG_QUEUE_SIZE, default 10000)
+        policy (str): What to do when the queue is full, see
+            BoundedQueueHandler (LOG_QUEUE_POLICY, default drop_new)
+        json_lines (bool): Write JSON lines instead of text (LOG_FORMAT=json)
+
     Returns:
         logging.Logger: Configured logger instance
     """
     # Get log level from environment or default to INFO
     log_level_str = os.getenv('LOG_LEVEL', 'INFO')
     log_level = getattr(logging, log_level_str.upper(), logging.INFO)
-    
+    if async_mode is None:
+        async_mode = os.getenv('LOG_ASYNC', '0').lower() in ('1', 'true', 'yes')
+    if queue_size is None:
+        queue_size = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    if policy is None:
+        policy = os.getenv('LOG_QUEUE_POLICY', 'drop_new')
+    if json_lines is None:
+        json_lines = os.getenv('LOG_FORMAT', 'text').lower() == 'json'
+
     # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
-    
+
     # Remove existing handlers if any
     if logger.handlers:
+        for handler in logger.handlers:
+            if isinstance(handler, BoundedQueueHandler):
+                _stop_listener(handler)
+                QUEUE_HANDLERS.pop(name, None)
         logger.handlers.clear()
-    
+
     # Create formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
+    if json_lines:
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # Create console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    
+
     # Create file handler
     logs_dir = 'logs'
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
-        
+
     file_handler = RotatingFileHandler(
         f"{logs_dir}/{name}.log",
         maxBytes=10485760,  # 10MB
@@ -48,9 +166,32 @@ def setup_logger(name):
     )
     file_handler.setLevel(log_level)
     file_handler.setFormatter(formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
+
+    if not async_mode:
+        # Add handlers to logger
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+        return logger
+
+    # The listener thread owns the real handlers from here on
+    queue_handler = BoundedQueueHandler(queue.Queue(queue_size), policy=policy)
+    queue_handler.listener = QueueListener(
+        queue_handler.queue, console_handler, file_handler, respect_handler_level=True
+    )
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    QUEUE_HANDLERS[name] = queue_handler
+
     return logger
+
+def _stop_listener(handler):
+    if handler.listener is not None:
+        # Writes out everything still queued before returning
+        handler.listener.stop()
+        handler.listener = None
+
+@atexit.register
+def stop_logging():
+    """Flush and stop every async-mode logger (runs at exit)."""
+    for handler in QUEUE_HANDLERS.values():
+        _stop_listener(handler)
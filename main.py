@@ -1,116 +1,401 @@
+import time
+STARTED = time.perf_counter()  # before the heavy imports, for the startup report
+
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands
 import os
-import json
 import random
+import io
+import itertools
+import asyncio
+
+from persistence import WriteBehindStore, make_backend
+from name_cache import NameResolver
+from locks import AccountLocks
+from inventory import ItemCatalogue
+from economy import EconomyManager
+from orders import BUY, SELL
+from variates import VariatePool, gamma_batch, preload_numpy
+from metrics import MetricsRegistry, counter, gauge
+from web import HealthServer, last_heartbeat_age
+from instrumentation import CommandStats
+from profiler import profile_event_loop
+from ratelimit import RateLimit, RateLimited, RateLimiter
+from dispatch import CoalescingContext, Dispatcher
+from startup import StartupTimer
+from logger import log_stats, setup_logger
+from prompts import PromptActive, PromptCancelled, PromptRegistry
+from polls import PollStore
+from memory import MemoryBudget, MemoryReport
+from member_cache import CachedMember, MemberLookup
+
+startup = StartupTimer(STARTED)
+startup.record("imports", STARTED, time.perf_counter())
 
-from flask import Flask
-from threading import Thread
+load_dotenv()
 
-app = Flask('')
+# MEMORY_BUDGET=low or minimal keeps much less of Discord's state in memory,
+# see memory.py; members are then looked up through bot.member_lookup
+memory_budget = MemoryBudget.from_env()
+intents = memory_budget.apply(discord.Intents.default())
+intents.message_content = True
 
-@app.route('/')
-def home():
-    return "I'm alive!"
+class Bot(commands.Bot):
+    async def get_context(self, origin, /, *, cls=CoalescingContext):
+        return await super().get_context(origin, cls=cls)
+
+# BasicCommands provides its own !help
+bot = Bot(command_prefix="!", intents=intents, help_command=None, **memory_budget.client_options(intents))
+bot.memory_budget = memory_budget
+bot.member_lookup = MemberLookup(
+    maxsize=int(os.getenv("MEMBER_LRU_SIZE", "1000")),
+    ttl=float(os.getenv("MEMBER_LRU_TTL", "600")),
+)
+# Replies to a busy channel are merged into one message, see dispatch.py;
+# DISPATCH_LINGER holds every reply briefly to merge even more
+bot.dispatcher = Dispatcher(linger=float(os.getenv("DISPATCH_LINGER", "0")))
+command_stats = CommandStats()
+command_stats.install(bot)
+account_locks = AccountLocks()
+
+SPIN_CHANNEL_ID = 1368871928961568779  # 🔁 Replace this with your real channel ID
+MAX_SPINS = 25
+
+def spin_cost(ctx):
+    # The check runs before arguments are parsed, so read the count from the
+    # message; calls !spin turns away without spinning cost nothing or one spin
+    if ctx.channel.id != SPIN_CHANNEL_ID:
+        return 0
+    words = ctx.view.buffer[ctx.view.index:].split(maxsplit=1)
+    if not words or not words[0].isdigit() or not 1 <= int(words[0]) <= MAX_SPINS:
+        return 1
+    return int(words[0])
+
+# Earning commands are rate limited per user (and spin per channel too); the
+# check runs before argument parsing, so rejected calls never touch storage.
+# Spin's user limit counts spins rather than calls: MAX_SPINS at once, then 1 every 2s
+RATE_LIMITS = {
+    "spin": [
+        RateLimit(rate=1 / 2, burst=MAX_SPINS, per="user", cost=spin_cost),
+        RateLimit(rate=2, burst=10, per="channel"),
+    ],
+    "work": [RateLimit(rate=1 / 60, burst=1, per="user")],
+    "gamble": [RateLimit(rate=1 / 10, burst=2, per="user")],
+}
+rate_limiter = RateLimiter(RATE_LIMITS)
+
+# Data loads in the background while the gateway connects, commands wait for it
+state_ready = asyncio.Event()
+
+async def wait_for_state(ctx):
+    await state_ready.wait()
+    return True
+
+bot.add_check(wait_for_state)
+bot.add_check(rate_limiter.check)
+# Interactive questions (like !gamble's amount) waiting for a reply
+prompts = PromptRegistry()
+names = NameResolver(
+    bot,
+    maxsize=int(os.getenv("NAME_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("NAME_CACHE_TTL", "600")),
+)
 
-def run_web():
-    app.run(host='0.0.0.0', port=8080)
+# === File Load/Save ===
+# STORAGE_BACKEND=sqlite stores everything in SQLITE_PATH instead of the JSON
+# files; run `python sqlite_backend.py` once to migrate existing data.
+# STORAGE_BACKEND=journal appends every change to JOURNAL_DIR instead, see
+# `python journal.py --help` for replaying it.
+store = WriteBehindStore(
+    make_backend(
+        os.getenv("STORAGE_BACKEND", "json"),
+        fsync=os.getenv("PERSIST_FSYNC", "always"),
+        sqlite_path=os.getenv("SQLITE_PATH", "economy.db"),
+        journal_dir=os.getenv("JOURNAL_DIR", "journal"),
+    ),
+    interval=float(os.getenv("PERSIST_INTERVAL", "5")),
+)
+
+def save_json(filename, data, key=None):
+    # Writes are coalesced and flushed in the background, see persistence.py
+    start = time.perf_counter()
+    store.register(filename, data)
+    store.mark_dirty(filename, key)
+    command_stats.add_storage_time(time.perf_counter() - start)
+
+# Each guild has its own users, market and boost, loaded on first use (see economy.py).
+# HOME_GUILD_ID is the guild the top-level data files belong to (or "dm" to
+# keep them for DMs only); it must be set if they hold data from before the split.
+economies = EconomyManager(
+    store,
+    save_json,
+    account_locks,
+    home_guild_id=os.getenv("HOME_GUILD_ID"),
+    directory=os.getenv("ECONOMY_DIR", "guilds"),
+    idle_timeout=float(os.getenv("ECONOMY_IDLE_TIMEOUT", "1800")),
+)
+
+# Poll votes are counted from reaction events (see polls.py); closed polls are
+# kept for !pollresults for POLL_RETENTION seconds
+bot.polls = PollStore(save_json, retention=float(os.getenv("POLL_RETENTION", str(7 * 86400))))
+
+def read_state():
+    """Load the item catalogue, the home guild's economy and the polls. Runs in a worker thread at startup."""
+    # Importing numpy takes ~80ms; do it here rather than in the first !roll or !spin
+    preload_numpy()
+    home = economies.read_home()
+    for multiplier in {1, home.boost.get("multiplier", 1)}:
+        spin_pool.prefill(multiplier)
+    return ItemCatalogue(store.backend.load("items.json", {})), home, store.backend.load("polls.json", {})
+
+def install_state(state):
+    """Make loaded data live (on the event loop) and let commands run."""
+    catalogue, home, polls = state
+    economies.catalogue = catalogue
+    store.register("items.json", catalogue.names)
+    economies.install(home)
+    bot.polls.load(polls)
+    store.register("polls.json", bot.polls.data)
+    state_ready.set()
+
+async def load_state():
+    try:
+        with startup.phase("state"):
+            install_state(await asyncio.to_thread(read_state))
+    except Exception as error:
+        # Running without data would hand out fresh accounts, so stop instead
+        print(f"❌ Failed to load data: {error!r}")
+        await bot.close()
+
+# Spin rolls are pre-generated per multiplier so !spin doesn't sample on the hot path
+spin_pool = VariatePool(lambda multiplier, n: gamma_batch(1.2 * multiplier, 50, n))
+
+# === Health & Metrics ===
+registry = MetricsRegistry()
+
+@registry.register
+def collect_core_metrics():
+    heartbeat_age = last_heartbeat_age(bot)
+    flush = store.metrics
+    return [
+        gauge("gateway_latency_seconds", "Gateway heartbeat latency", bot.latency),
+        gauge("gateway_heartbeat_age_seconds", "Seconds since the last heartbeat ACK", heartbeat_age),
+        gauge("guilds", "Guilds the bot is in", len(bot.guilds)),
+        gauge("users", "Users in the loaded economies", sum(len(economy.users) for economy in economies)),
+        gauge("market_listings", "Active listings in the loaded economies", sum(len(economy.market) for economy in economies)),
+        gauge("economies_loaded", "Guild economies held in memory", len(economies)),
+        counter("economy_loads_total", "Guild economies loaded from storage", economies.stats["loads"]),
+        counter("economy_evictions_total", "Idle guild economies dropped from memory", economies.stats["evictions"]),
+        gauge("persistence_pending_files", "Data sets waiting for a flush", store.pending),
+        counter("persistence_flushes_total", "Write-behind flushes", flush.flushes),
+        counter("persistence_flush_failures_total", "Failed write-behind flushes", flush.failures),
+        counter("persistence_bytes_written_total", "Bytes written by flushes", flush.bytes_written),
+        gauge("persistence_last_flush_seconds", "Latency of the last flush", flush.last_latency),
+        ("name_cache_lookups_total", "counter", "Name lookups by outcome", [
+            ("name_cache_lookups_total", {"outcome": outcome}, names.stats[outcome])
+            for outcome in ("local_hits", "cache_hits", "misses")
+        ]),
+        counter("name_cache_api_calls_total", "fetch_user calls made by the name cache", names.stats["api_calls"]),
+        counter("lock_acquisitions_total", "Account lock acquisitions", account_locks.stats.acquisitions),
+        counter("lock_contended_total", "Account lock acquisitions that had to wait", account_locks.stats.contended),
+        counter("lock_wait_seconds_total", "Time spent waiting on contended account locks", account_locks.stats.total_wait),
+    ]
 
-def keep_alive():
-    t = Thread(target=run_web)
-    t.start()
+registry.register(command_stats.collect)
+registry.register(bot.dispatcher.collect)
+registry.register(startup.collect)
+registry.register(bot.polls.collect)
+
+@registry.register
+def collect_rate_limit_metrics():
+    return [
+        ("rate_limit_decisions_total", "counter", "Rate limit decisions by outcome", [
+            ("rate_limit_decisions_total", {"outcome": outcome}, rate_limiter.stats[outcome])
+            for outcome in ("allowed", "rejected")
+        ]),
+        counter("rate_limit_evictions_total", "Buckets evicted before they refilled", rate_limiter.stats["evicted"]),
+        gauge("rate_limit_buckets", "Rate limit buckets held in memory", len(rate_limiter)),
+    ]
 
+@registry.register
+def collect_prompt_metrics():
+    return [
+        gauge("prompts_open", "Interactive prompts waiting for a reply", len(prompts)),
+        ("prompts_total", "counter", "Interactive prompts by outcome", [
+            ("prompts_total", {"outcome": outcome}, count) for outcome, count in prompts.stats.items()
+        ]),
+    ]
 
-load_dotenv()
+@registry.register
+def collect_logging_metrics():
+    stats = log_stats()
+    return [
+        ("log_records_total", "counter", "Log records queued or dropped (LOG_ASYNC=1)", [
+            ("log_records_total", {"logger": name, "outcome": outcome}, logger_stats[outcome])
+            for name, logger_stats in stats.items()
+            for outcome in ("enqueued", "dropped")
+        ]),
+        ("log_queue_depth", "gauge", "Log records waiting for the listener thread", [
+            ("log_queue_depth", {"logger": name}, logger_stats["depth"]) for name, logger_stats in stats.items()
+        ]),
+    ]
 
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# === Memory Report ===
+# What each cache holds, for !memory (entry sizes are sampled, see memory.py)
+memory_report = MemoryReport()
+memory_report.register(
+    "Members", lambda: sum(len(guild.members) for guild in bot.guilds),
+    lambda: itertools.chain.from_iterable(guild.members for guild in bot.guilds),
+)
+memory_report.register("Users", lambda: len(bot.users), lambda: bot.users)
+memory_report.register("Messages", lambda: len(bot.cached_messages), lambda: bot.cached_messages)
+memory_report.register(
+    "Channels", lambda: sum(len(guild.channels) for guild in bot.guilds),
+    lambda: itertools.chain.from_iterable(guild.channels for guild in bot.guilds),
+)
+memory_report.register(
+    "Roles", lambda: sum(len(guild.roles) for guild in bot.guilds),
+    lambda: itertools.chain.from_iterable(guild.roles for guild in bot.guilds),
+)
+memory_report.register("Member LRU", lambda: len(bot.member_lookup), bot.member_lookup.values)
+memory_report.register("Name cache", lambda: len(names), names.values)
+memory_report.register(
+    "Economy accounts", lambda: sum(len(eco.users) for eco in economies),
+    lambda: itertools.chain.from_iterable(eco.users.values() for eco in economies),
+)
+memory_report.register(
+    "Market listings", lambda: sum(len(eco.market) for eco in economies),
+    lambda: itertools.chain.from_iterable(eco.market.listings.values() for eco in economies),
+)
+memory_report.register("Polls", lambda: len(bot.polls.data), lambda: bot.polls.data.values())
+
+health_server = HealthServer(
+    bot,
+    registry,
+    sections={
+        "persistence": lambda: {"pending_files": store.pending, **store.metrics.as_dict()},
+        "startup": startup.as_dict,
+    },
+    port=int(os.getenv("PORT", "8080")),
+)
 
-# === File Load/Save ===
-def load_json(filename):
-    try:
-        with open(filename, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        if filename == "market.json":
-            return []  # Return empty list for market
-        return {}  # Return empty dict for other files
+# === Events ===
+# Cogs loaded at startup; EXTENSIONS overrides the list (comma separated)
+EXTENSIONS = [name for name in os.getenv("EXTENSIONS", "basic_commands,utility_commands").split(",") if name]
 
-def save_json(filename, data):
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=4)
+async def load_extensions():
+    with startup.phase("extensions"):
+        for name in EXTENSIONS:
+            try:
+                await bot.load_extension(name)
+            except commands.ExtensionError as error:
+                print(f"❌ Failed to load extension {name}: {error}")
 
-users = load_json("users.json")
-market = load_json("market.json")  # Will be [] if not exists
-boost = load_json("boost.json") or {"multiplier": 1, "spins_left": 0}
+@bot.event
+async def setup_hook():
+    startup.end("login")
+    store.start()
+    economies.start()
+    bot.state_loader = asyncio.create_task(load_state())
+    await load_extensions()
+    await health_server.start()
+    startup.begin("gateway")
 
-# === Events ===
 @bot.event
 async def on_ready():
     print(f"✅ Logged in as {bot.user}")
+    startup.end("gateway")
+    await state_ready.wait()
+    if startup.ready():
+        bot.uptime = time.time()  # shown by !info
+        print(startup.summary())
+
+@bot.listen("on_message")
+async def answer_prompts(message):
+    if not message.author.bot:
+        prompts.feed(message)
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, RateLimited):
+        await ctx.send(f"⏳ Slow down {ctx.author.name}! Try `!{error.command}` again in {error.retry_after:.1f}s.")
+        return
+    # Everything else is reported the way discord.py does by default
+    await commands.Bot.on_command_error(bot, ctx, error)
 
 # === Commands ===
 @bot.command()
-async def spin(ctx):
-    allowed_channel_id = 1368871928961568779  # 🔁 Replace this with your real channel ID
+async def spin(ctx, count: int = 1):
+    if ctx.channel.id != SPIN_CHANNEL_ID:
+        await ctx.send(f"❌ You can only use `!spin` in <#{SPIN_CHANNEL_ID}>.")
+        return
 
-    if ctx.channel.id != allowed_channel_id:
-        await ctx.send(f"❌ You can only use `!spin` in <#{allowed_channel_id}>.")
+    if count < 1 or count > MAX_SPINS:
+        await ctx.send(f"❌ You can spin between 1 and {MAX_SPINS} times at once.")
         return
         
     user_id = str(ctx.author.id)
     
+    eco = await economies.get(ctx.guild)
     # Initialize user data if not exists
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
+    eco.account(user_id)
         
-    multiplier = boost.get("multiplier", 1)
-    if boost.get("spins_left", 0) > 0:
-        boost["spins_left"] -= 1
-        if boost["spins_left"] == 0:
-            boost["multiplier"] = 1
-    save_json("boost.json", boost)
+    # Boosted spins come first, the rest of the batch uses the multiplier left afterwards
+    multiplier = eco.boost.get("multiplier", 1)
+    boosted = min(count, eco.boost.get("spins_left", 0))
+    if boosted > 0:
+        eco.boost["spins_left"] -= boosted
+        if eco.boost["spins_left"] == 0:
+            eco.boost["multiplier"] = 1
+        eco.save("boost.json")
 
     # Weighted spin: rare big numbers
-    roll = int(min(999_999_999_999_999_999_999_999_999, random.gammavariate(1.2 * multiplier, 50)))
-    users[user_id]["credits"] += roll
-    save_json("users.json", users)
+    draws = spin_pool.take(multiplier, boosted) + spin_pool.take(eco.boost.get("multiplier", 1), count - boosted)
+    rolls = [int(min(999_999_999_999_999_999_999_999_999, draw)) for draw in draws]
+    total = sum(rolls)
+    eco.add_credits(user_id, total)
 
-    await ctx.send(f"🎰 {ctx.author.name} spun and got **{roll:,}** credits! 💰")
+    if count == 1:
+        await ctx.send(f"🎰 {ctx.author.name} spun and got **{total:,}** credits! 💰")
+    else:
+        await ctx.send(f"🎰 {ctx.author.name} spun {count} times and got **{total:,}** credits! 💰 "
+                       f"(best spin: {max(rolls):,})")
 
 @bot.command()
 async def sacrifice(ctx, amount: int):
     user_id = str(ctx.author.id)
     
+    eco = await economies.get(ctx.guild)
     # Initialize user data if not exists
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
+    eco.account(user_id)
     
-    if user_id not in users or users[user_id]["credits"] < amount or amount <= 0:
+    async with eco.lock(user_id):
+        sacrificed = amount > 0 and eco.users[user_id]["credits"] >= amount
+        if sacrificed:
+            eco.add_credits(user_id, -amount)
+            eco.boost["multiplier"] = 1 + amount // 1000
+            eco.boost["spins_left"] = 10
+            eco.save("boost.json")
+
+    if not sacrificed:
         await ctx.send("❌ Not enough credits to sacrifice.")
         return
 
-    users[user_id]["credits"] -= amount
-    boost["multiplier"] = 1 + amount // 1000
-    boost["spins_left"] = 10
-    save_json("users.json", users)
-    save_json("boost.json", boost)
-
     await ctx.send(f"🔥 {ctx.author.name} sacrificed {amount:,} credits!\n"
-                   f"➡️ Boost active! Multiplier: x{boost['multiplier']} for {boost['spins_left']} spins.")
+                   f"➡️ Boost active! Multiplier: x{eco.boost['multiplier']} for {eco.boost['spins_left']} spins.")
 
 @bot.command()
 async def credits(ctx):
     user_id = str(ctx.author.id)
     
+    eco = await economies.get(ctx.guild)
     # Initialize user data if not exists
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
-        save_json("users.json", users)
+    if user_id not in eco.users:
+        eco.account(user_id)
+        eco.save("users.json", user_id)
         
-    balance = users[user_id]["credits"]
+    balance = eco.users[user_id]["credits"]
     await ctx.send(f"💳 {ctx.author.name}, you have **{balance:,}** credits.")
 
 @bot.command()
@@ -125,75 +410,241 @@ async def additem(ctx, name: str, price: int):
         return
 
     user_id = str(ctx.author.id)
-    market.append({"name": name, "price": price, "seller": user_id})
-    save_json("market.json", market)
-    await ctx.send(f"🛒 Added '{name}' to the market for {price:,} credits.")
+    eco = await economies.get(ctx.guild)
+    listing_id = eco.market.add(name, price, user_id)
+    eco.save("market.json", listing_id)
+    await ctx.send(f"🛒 Added '{name}' to the market for {price:,} credits (listing #{listing_id}).")
+
+MARKET_PAGE_SIZE = 10
+
+def parse_market_filters(args):
+    """Parse `!marketlist` arguments like `page 3 seller:@x max:5000`."""
+    filters = {"page": 1}
+    args = list(args)
+    while args:
+        arg = args.pop(0).lower()
+        key, _, value = arg.partition(":")
+        if arg == "page" and args:
+            filters["page"] = int(args.pop(0))
+        elif arg.isdigit():
+            filters["page"] = int(arg)
+        elif key == "seller":
+            filters["seller"] = value.strip("<@!>")
+        elif key == "name":
+            filters["name"] = value
+        elif key in ("min", "max"):
+            filters[f"{key}_price"] = int(value.replace(",", ""))
+        else:
+            raise ValueError(arg)
+    return filters
 
 @bot.command()
-async def marketlist(ctx):
-    if not market:
+async def marketlist(ctx, *args):
+    eco = await economies.get(ctx.guild)
+    if not eco.market:
         await ctx.send("🛍️ The market is empty!")
         return
 
-    msg = "**🛍️ Market Listings:**\n"
-    for i, item in enumerate(market, start=1):
-        try:
-            seller_name = await bot.fetch_user(int(item["seller"]))
-            msg += f"{i}. {item['name']} - {item['price']:,} credits (by {seller_name.name})\n"
-        except:
-            msg += f"{i}. {item['name']} - {item['price']:,} credits (by unknown user)\n"
+    try:
+        filters = parse_market_filters(args)
+    except ValueError:
+        await ctx.send("❌ Usage: `!marketlist [page N] [seller:@user] [name:item] [min:price] [max:price]`")
+        return
+
+    page = max(filters.pop("page"), 1)
+    start = (page - 1) * MARKET_PAGE_SIZE
+    if filters:
+        matches = eco.market.search(**filters)
+        total = len(matches)
+        listings = matches[start:start + MARKET_PAGE_SIZE]
+    else:
+        total = len(eco.market)
+        listings = list(itertools.islice(eco.market.listings.items(), start, start + MARKET_PAGE_SIZE))
+
+    if not listings:
+        await ctx.send("🛍️ No listings match that search." if page == 1 else f"🛍️ There is no page {page}.")
+        return
+
+    seller_names = await names.resolve_many((item["seller"] for _, item in listings), ctx.guild)
+    pages = -(-total // MARKET_PAGE_SIZE)
+
+    msg = f"**🛍️ Market Listings** (page {page}/{pages}, {total:,} listings):\n"
+    for listing_id, item in listings:
+        seller_name = seller_names[int(item["seller"])] or "unknown user"
+        line = f"#{listing_id} {item['name']} - {item['price']:,} credits (by {seller_name})\n"
+        if len(msg) + len(line) > 1900:
+            break
+        msg += line
+    if page < pages:
+        msg += f"Use `!marketlist page {page + 1}` for more. Buy with `!buy <listing #>`."
     await ctx.send(msg)
 
 @bot.command()
-async def buy(ctx, item_number: int):
+async def buy(ctx, listing_id: int):
     user_id = str(ctx.author.id)
     
+    eco = await economies.get(ctx.guild)
     # Initialize user data if not exists
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
+    eco.account(user_id)
         
-    if item_number < 1 or item_number > len(market):
-        await ctx.send("❌ Invalid item number.")
+    # Lock the buyer and the listing so the same listing can't be sold twice
+    async with eco.lock(user_id, f"listing:{listing_id}"):
+        item = eco.market.get(listing_id)
+        affordable = item is not None and eco.users[user_id]["credits"] >= item["price"]
+        if affordable:
+            eco.market.remove(listing_id)
+            eco.save("market.json", str(listing_id))
+
+            eco.add_credits(user_id, -item["price"])
+            eco.give_item(user_id, item["name"])
+
+    if item is None:
+        await ctx.send("❌ That listing doesn't exist (it may have just been sold).")
         return
 
-    item = market[item_number - 1]
-    if users[user_id]["credits"] < item["price"]:
+    if not affordable:
         await ctx.send("❌ You don't have enough credits.")
         return
 
-    users[user_id]["credits"] -= item["price"]
-    
-    # Make sure inventory exists
-    if "inventory" not in users[user_id]:
-        users[user_id]["inventory"] = []
-        
-    users[user_id]["inventory"].append(item["name"])
-    save_json("users.json", users)
-
-    market.pop(item_number - 1)
-    save_json("market.json", market)
-
     await ctx.send(f"✅ You bought **{item['name']}**!")
 
 @bot.command()
-async def removeitem(ctx, item_number: int):
+async def removeitem(ctx, listing_id: int):
     user_id = str(ctx.author.id)
     is_owner = str(ctx.author.id) == "859193969061920788"
 
-    if item_number < 1 or item_number > len(market):
-        await ctx.send("❌ Invalid item number.")
+    eco = await economies.get(ctx.guild)
+    item = eco.market.get(listing_id)
+    if item is None:
+        await ctx.send("❌ That listing doesn't exist.")
         return
 
-    item = market[item_number - 1]
     if item["seller"] != user_id and not is_owner:
         await ctx.send("⛔ You can only remove your own items (unless you're the server owner).")
         return
 
-    removed = market.pop(item_number - 1)
-    save_json("market.json", market)
+    removed = eco.market.remove(listing_id)
+    eco.save("market.json", str(listing_id))
 
     await ctx.send(f"🗑️ Removed **{removed['name']}** from the market.")
 
+# === Order Books ===
+# !bid and !ask place limit orders that are matched with price-time priority
+# (see orders.py); credits and items are held in escrow while an order rests
+ORDERBOOK_DEPTH = 10
+
+async def place_order(ctx, side, name, price, quantity):
+    if discord.utils.get(getattr(ctx.author, "roles", ()), name="Market Banned"):
+        await ctx.send("🚫 You are not allowed to trade on the market.")
+        return
+
+    if price <= 0 or quantity <= 0:
+        await ctx.send("❌ Price and quantity must be greater than 0.")
+        return
+
+    user_id = str(ctx.author.id)
+    eco = await economies.get(ctx.guild)
+    item_id = economies.catalogue.find(name)
+    placed = None
+    if item_id is not None:
+        # The book lock keeps matching and escrow for one item in order
+        async with eco.lock(user_id, f"book:{item_id}"):
+            placed = eco.place_order(user_id, item_id, side, price, quantity)
+    elif side == BUY:
+        # A bid can name an item nobody has yet, which only joins the catalogue
+        # once the bid is escrowed (it can't match anything, so no book lock)
+        async with eco.lock(user_id):
+            if eco.account(user_id)["credits"] >= price * quantity:
+                placed = eco.place_order(user_id, eco.item_id(name), side, price, quantity)
+
+    if placed is None:
+        if side == BUY:
+            await ctx.send(f"❌ You need {price * quantity:,} credits to place that order.")
+        else:
+            await ctx.send(f"❌ You don't have {quantity:,} × **{name}** to sell.")
+        return
+
+    order_id, fills = placed
+    filled = sum(traded for _, _, traded, _ in fills)
+    value = sum(traded * trade_price for _, _, traded, trade_price in fills)
+    lines = []
+    if filled:
+        lines.append(f"✅ {'Bought' if side == BUY else 'Sold'} {filled:,} × **{name}** for {value:,} credits.")
+    if order_id is not None:
+        remaining = eco.orders.get(order_id)["q"]
+        lines.append(
+            f"📋 Order #{order_id}: {'buying' if side == BUY else 'selling'} {remaining:,} "
+            f"{'more ' if filled else ''}at {price:,} credits each. Cancel with `!cancelorder {order_id}`."
+        )
+    await ctx.send("\n".join(lines))
+
+@bot.command()
+async def bid(ctx, name: str, price: int, quantity: int = 1):
+    await place_order(ctx, BUY, name, price, quantity)
+
+@bot.command()
+async def ask(ctx, name: str, price: int, quantity: int = 1):
+    await place_order(ctx, SELL, name, price, quantity)
+
+@bot.command()
+async def cancelorder(ctx, order_id: int):
+    user_id = str(ctx.author.id)
+    eco = await economies.get(ctx.guild)
+    order = eco.orders.get(order_id)
+    if order is not None and order["u"] != user_id:
+        await ctx.send("⛔ You can only cancel your own orders.")
+        return
+
+    cancelled = None
+    if order is not None:
+        async with eco.lock(user_id, f"book:{order['i']}"):
+            cancelled = eco.cancel_order(order_id)
+    if cancelled is None:
+        await ctx.send("❌ That order doesn't exist (it may have just filled).")
+        return
+
+    name = economies.catalogue.name(cancelled["i"])
+    if cancelled["s"] == BUY:
+        returned = f"{cancelled['p'] * cancelled['q']:,} credits"
+    else:
+        returned = f"{cancelled['q']:,} × **{name}**"
+    await ctx.send(f"🗑️ Cancelled order #{order_id}; {returned} returned to you.")
+
+@bot.command()
+async def myorders(ctx):
+    user_id = str(ctx.author.id)
+    eco = await economies.get(ctx.guild)
+    order_ids = eco.orders.by_user(user_id)
+    if not order_ids:
+        await ctx.send("📋 You have no open orders.")
+        return
+
+    msg = f"**📋 Your open orders** ({len(order_ids):,}):\n"
+    for order_id in order_ids:
+        order = eco.orders.get(order_id)
+        verb = "Buy" if order["s"] == BUY else "Sell"
+        line = f"#{order_id} {verb} {order['q']:,} × {economies.catalogue.name(order['i'])} at {order['p']:,} credits\n"
+        if len(msg) + len(line) > 1900:
+            break
+        msg += line
+    await ctx.send(msg)
+
+@bot.command()
+async def orderbook(ctx, *, name: str):
+    eco = await economies.get(ctx.guild)
+    item_id = economies.catalogue.find(name)
+    bids, asks = eco.orders.depth(item_id, ORDERBOOK_DEPTH) if item_id is not None else ([], [])
+    if not bids and not asks:
+        await ctx.send(f"📖 There are no orders for **{name}**. Place one with `!bid` or `!ask`.")
+        return
+
+    # Asks on top (best ask nearest the spread), bids below
+    rows = [f"SELL {price:>10,} × {quantity:<8,}" for price, quantity in reversed(asks)]
+    if bids and asks:
+        rows.append(f"---- spread {asks[0][0] - bids[0][0]:,} ----")
+    rows += [f"BUY  {price:>10,} × {quantity:<8,}" for price, quantity in bids]
+    await ctx.send(f"📖 **Order book: {name}**\n```\n" + "\n".join(rows) + "\n```")
+
 @bot.command()
 async def bonus(ctx, multiplier: int):
     author_id = str(ctx.author.id)
@@ -205,9 +656,10 @@ async def bonus(ctx, multiplier: int):
         await ctx.send("❌ Multiplier must be greater than 1.")
         return
 
-    boost["multiplier"] = multiplier
-    boost["spins_left"] = 1
-    save_json("boost.json", boost)
+    eco = await economies.get(ctx.guild)
+    eco.boost["multiplier"] = multiplier
+    eco.boost["spins_left"] = 1
+    eco.save("boost.json")
 
     await ctx.send(f"🎁 Bonus activated! Multiplier x{multiplier} for the **next spin only**!")
 
@@ -220,62 +672,82 @@ async def gamble(ctx):
         return
 
     user_id = str(ctx.author.id)
-    users.setdefault(user_id, {"credits": 0, "inventory": []})
+    eco = await economies.get(ctx.guild)
+    eco.account(user_id)
 
-    await ctx.send(f"{ctx.author.mention}, how much would you like to gamble? Type the amount below:")
+    # Opened before asking so a quick reply can't slip past
+    try:
+        prompt = prompts.open(ctx.channel.id, ctx.author.id, check=lambda m: m.content.isdigit())
+    except PromptActive:
+        await ctx.send(f"⏳ {ctx.author.mention}, answer your open question first (or type `!cancel`).")
+        return
 
-    def check(m):
-        return m.author == ctx.author and m.channel == ctx.channel and m.content.isdigit()
+    try:
+        await ctx.send(f"{ctx.author.mention}, how much would you like to gamble? Type the amount below:")
+    except Exception:
+        prompt.close()
+        raise
 
     try:
-        msg = await bot.wait_for("message", check=check, timeout=30)
+        msg = await prompt.wait(timeout=30)
         amount = int(msg.content)
-    except:
+    except PromptCancelled:
+        await ctx.send("❎ Gamble cancelled.")
+        return
+    except asyncio.TimeoutError:
         await ctx.send("⏰ You didn't reply in time with a valid number!")
         return
 
-    balance = users[user_id]["credits"]
-    if amount > balance or amount <= 0:
-        await ctx.send(f"❌ Invalid amount. You have {balance} credits.")
-        return
+    # Re-read the balance under the lock, it may have changed while we waited for the reply
+    async with eco.lock(user_id):
+        balance = eco.users[user_id]["credits"]
+        valid = 0 < amount <= balance
+        won = valid and random.random() < 0.5
+        if valid:
+            eco.add_credits(user_id, amount if won else -amount)
+        balance = eco.users[user_id]["credits"]
 
-    import random
-    if random.random() < 0.5:
-        users[user_id]["credits"] += amount
-        await ctx.send(f"🎉 {ctx.author.mention} gambled and **doubled** {amount} credits! You now have {users[user_id]['credits']}.")
+    if not valid:
+        await ctx.send(f"❌ Invalid amount. You have {balance} credits.")
+    elif won:
+        await ctx.send(f"🎉 {ctx.author.mention} gambled and **doubled** {amount} credits! You now have {balance}.")
     else:
-        users[user_id]["credits"] -= amount
-        await ctx.send(f"💀 {ctx.author.mention} lost it all... {amount} credits gone. You now have {users[user_id]['credits']}.")
+        await ctx.send(f"💀 {ctx.author.mention} lost it all... {amount} credits gone. You now have {balance}.")
 
-    save_json("users.json", users)
+@bot.command()
+async def cancel(ctx):
+    if prompts.cancel(ctx.author.id):
+        return  # the waiting command replies
+    await ctx.send("🤷 You don't have anything waiting for an answer.")
 
 @bot.command()
-async def forcegamble(ctx, member: discord.Member, amount: int):
+async def forcegamble(ctx, member: CachedMember, amount: int):
     owner_id = "859193969061920788"  # replace with your Discord ID
     if str(ctx.author.id) != owner_id:
         await ctx.send("⛔ Only the server owner can force others to gamble.")
         return
 
     user_id = str(member.id)
-    users.setdefault(user_id, {"credits": 0, "inventory": []})
+    eco = await economies.get(ctx.guild)
+    eco.account(user_id)
 
     if amount <= 0:
         await ctx.send("❌ Amount must be greater than 0.")
         return
 
-    if users[user_id]["credits"] < amount:
-        await ctx.send(f"❌ {member.display_name} doesn't have enough credits to gamble {amount}.")
-        return
+    async with eco.lock(user_id):
+        valid = eco.users[user_id]["credits"] >= amount
+        won = valid and random.random() < 0.5
+        if valid:
+            eco.add_credits(user_id, amount if won else -amount)
+        balance = eco.users[user_id]["credits"]
 
-    import random
-    if random.random() < 0.5:
-        users[user_id]["credits"] += amount
-        await ctx.send(f"🎲 {ctx.author.mention} forced {member.mention} to gamble and they **WON**! They now have {users[user_id]['credits']} credits.")
+    if not valid:
+        await ctx.send(f"❌ {member.display_name} doesn't have enough credits to gamble {amount}.")
+    elif won:
+        await ctx.send(f"🎲 {ctx.author.mention} forced {member.mention} to gamble and they **WON**! They now have {balance} credits.")
     else:
-        users[user_id]["credits"] -= amount
-        await ctx.send(f"💀 {ctx.author.mention} forced {member.mention} to gamble and they **LOST** {amount} credits. Balance: {users[user_id]['credits']}.")
-
-    save_json("users.json", users)
+        await ctx.send(f"💀 {ctx.author.mention} forced {member.mention} to gamble and they **LOST** {amount} credits. Balance: {balance}.")
 
 
 
@@ -283,7 +755,7 @@ async def forcegamble(ctx, member: discord.Member, amount: int):
 
 
 @bot.command()
-async def resetcredits(ctx, member: discord.Member):
+async def resetcredits(ctx, member: CachedMember):
     # ✅ Only allow YOU to run it
     author_id = str(ctx.author.id)
     if author_id != "859193969061920788":  # ← Replace with your ID
@@ -291,12 +763,8 @@ async def resetcredits(ctx, member: discord.Member):
         return
 
     user_id = str(member.id)
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
-    else:
-        users[user_id]["credits"] = 0
-
-    save_json("users.json", users)
+    eco = await economies.get(ctx.guild)
+    eco.set_credits(user_id, 0)
     await ctx.send(f"🧼 Reset {member.mention}'s credits to **0**.")
 
 @bot.command()
@@ -306,14 +774,15 @@ async def resetboost(ctx):
         await ctx.send("⛔ Only the server owner can reset the boost.")
         return
 
-    boost["multiplier"] = 1
-    boost["spins_left"] = 0
-    save_json("boost.json", boost)
+    eco = await economies.get(ctx.guild)
+    eco.boost["multiplier"] = 1
+    eco.boost["spins_left"] = 0
+    eco.save("boost.json")
 
     await ctx.send("🧯 Boost has been manually reset.")
 
 @bot.command()
-async def addcredits(ctx, member: discord.Member, amount: int):
+async def addcredits(ctx, member: CachedMember, amount: int):
     author_id = str(ctx.author.id)
     if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
         await ctx.send("⛔ Only the server owner can give credits.")
@@ -324,16 +793,15 @@ async def addcredits(ctx, member: discord.Member, amount: int):
         return
 
     user_id = str(member.id)
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
+    eco = await economies.get(ctx.guild)
+    eco.account(user_id)
 
-    users[user_id]["credits"] += amount
-    save_json("users.json", users)
+    eco.add_credits(user_id, amount)
 
     await ctx.send(f"💸 Gave {member.mention} **{amount}** credits.")
 
 @bot.command()
-async def remcredits(ctx, member: discord.Member, amount: int):
+async def remcredits(ctx, member: CachedMember, amount: int):
     author_id = str(ctx.author.id)
     if author_id != "859193969061920788":  # 👈 Replace with your user ID
         await ctx.send("⛔ Only the server owner can remove credits.")
@@ -344,16 +812,15 @@ async def remcredits(ctx, member: discord.Member, amount: int):
         return
 
     user_id = str(member.id)
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
+    eco = await economies.get(ctx.guild)
+    eco.account(user_id)
 
-    users[user_id]["credits"] = max(users[user_id]["credits"] - amount, 0)
-    save_json("users.json", users)
+    eco.set_credits(user_id, max(eco.users[user_id]["credits"] - amount, 0))
 
-    await ctx.send(f"➖ Removed **{amount}** credits from {member.mention}. New balance: {users[user_id]['credits']:,}")
+    await ctx.send(f"➖ Removed **{amount}** credits from {member.mention}. New balance: {eco.users[user_id]['credits']:,}")
 
 @bot.command()
-async def pay(ctx, member: discord.Member, amount: int):
+async def pay(ctx, member: CachedMember, amount: int):
     sender_id = str(ctx.author.id)
     receiver_id = str(member.id)
 
@@ -365,20 +832,22 @@ async def pay(ctx, member: discord.Member, amount: int):
         await ctx.send("❌ Amount must be greater than 0.")
         return
 
+    eco = await economies.get(ctx.guild)
     # Make sure both users exist
-    if sender_id not in users:
-        users[sender_id] = {"credits": 0, "inventory": []}
-    if receiver_id not in users:
-        users[receiver_id] = {"credits": 0, "inventory": []}
+    eco.account(sender_id)
+    eco.account(receiver_id)
+
+    # Both accounts are locked (in a fixed order) so the transfer happens as one unit
+    async with eco.lock(sender_id, receiver_id):
+        sent = eco.users[sender_id]["credits"] >= amount
+        if sent:
+            eco.add_credits(sender_id, -amount)
+            eco.add_credits(receiver_id, amount)
 
-    if users[sender_id]["credits"] < amount:
+    if not sent:
         await ctx.send("❌ You don't have enough credits to send.")
         return
 
-    users[sender_id]["credits"] -= amount
-    users[receiver_id]["credits"] += amount
-    save_json("users.json", users)
-
     await ctx.send(f"💸 {ctx.author.name} sent **{amount}** credits to {member.mention}!")
 
 
@@ -395,14 +864,13 @@ async def work(ctx):
 
     user_id = str(ctx.author.id)
     
+    eco = await economies.get(ctx.guild)
     # Initialize user data if not exists
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
+    eco.account(user_id)
     
     # Give a random amount between 50 and 200 credits
     earnings = random.randint(50, 200)
-    users[user_id]["credits"] += earnings
-    save_json("users.json", users)
+    eco.add_credits(user_id, earnings)
     
     # List of possible work scenarios
     work_scenarios = [
@@ -420,28 +888,20 @@ async def work(ctx):
 async def inventory(ctx):
     user_id = str(ctx.author.id)
     
+    eco = await economies.get(ctx.guild)
     # Initialize user data if not exists
-    if user_id not in users:
-        users[user_id] = {"credits": 0, "inventory": []}
-        save_json("users.json", users)
+    if user_id not in eco.users:
+        eco.account(user_id)
+        eco.save("users.json", user_id)
     
-    if not users[user_id]["inventory"]:
+    if not eco.users[user_id]["inventory"]:
         await ctx.send(f"🎒 {ctx.author.name}, your inventory is empty!")
         return
         
-    items = users[user_id]["inventory"]
-    
-    # Count occurrences of each item
-    item_counts = {}
-    for item in items:
-        if item in item_counts:
-            item_counts[item] += 1
-        else:
-            item_counts[item] = 1
-    
-    # Format the inventory message
+    # Inventories are already stored as {item_id: count}
     msg = f"🎒 **{ctx.author.name}'s Inventory:**\n"
-    for item, count in item_counts.items():
+    for item_id, count in eco.users[user_id]["inventory"].items():
+        item = economies.catalogue.name(item_id)
         if count > 1:
             msg += f"• {item} (x{count})\n"
         else:
@@ -452,25 +912,170 @@ async def inventory(ctx):
 # Command to check leaderboard
 @bot.command(aliases=["lb"])
 async def leaderboard(ctx):
-    if not users:
+    eco = await economies.get(ctx.guild)
+    if not eco.leaderboard:
         await ctx.send("📊 No users on the leaderboard yet!")
         return
     
-    # Sort users by credits
-    sorted_users = sorted(users.items(), key=lambda x: x[1].get("credits", 0), reverse=True)
+    # Top 10 straight from the ranked index, no sorting needed
+    top_users = eco.leaderboard.top(10)
     
-    # Take top 10
-    top_users = sorted_users[:10]
+    user_names = await names.resolve_many((user_id for user_id, _ in top_users), ctx.guild)
     
     msg = "📊 **Credits Leaderboard:**\n"
-    for i, (user_id, data) in enumerate(top_users, start=1):
-        try:
-            user = await bot.fetch_user(int(user_id))
-            msg += f"{i}. {user.name}: **{data.get('credits', 0):,}** credits\n"
-        except:
-            msg += f"{i}. Unknown User: **{data.get('credits', 0):,}** credits\n"
+    for i, (user_id, credits) in enumerate(top_users, start=1):
+        user_name = user_names[int(user_id)] or "Unknown User"
+        msg += f"{i}. {user_name}: **{credits:,}** credits\n"
     
     await ctx.send(msg)
 
-keep_alive()
-bot.run(os.getenv("DISCORD_TOKEN"))
\ No newline at end of file
+# Command to check a user's leaderboard position
+@bot.command()
+async def rank(ctx, member: CachedMember = None):
+    member = member or ctx.author
+    eco = await economies.get(ctx.guild)
+    position = eco.leaderboard.rank(str(member.id))
+
+    if position is None:
+        await ctx.send(f"📊 {member.display_name} isn't on the leaderboard yet!")
+        return
+
+    balance = eco.users[str(member.id)]["credits"]
+    await ctx.send(f"📊 {member.display_name} is ranked **#{position:,}** of {len(eco.leaderboard):,} with **{balance:,}** credits.")
+
+@bot.command()
+async def storagestats(ctx):
+    author_id = str(ctx.author.id)
+    if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
+        await ctx.send("⛔ Only the server owner can view storage stats.")
+        return
+
+    stats = store.metrics.as_dict()
+    await ctx.send(
+        f"💾 **Storage:** {stats['flushes']:,} flushes, {stats['bytes_written']:,} bytes written, "
+        f"{stats['failures']} failed\n"
+        f"⏱️ Flush latency: last {stats['last_latency_ms']}ms, avg {stats['avg_latency_ms']}ms, "
+        f"max {stats['max_latency_ms']}ms\n"
+        f"📝 Pending files: {store.pending}\n"
+        f"🏘️ Guild economies: {len(economies)} loaded, {economies.stats['loads']:,} loads, "
+        f"{economies.stats['evictions']:,} evictions"
+    )
+
+@bot.command()
+async def namecache(ctx):
+    author_id = str(ctx.author.id)
+    if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
+        await ctx.send("⛔ Only the server owner can view name cache stats.")
+        return
+
+    stats = names.stats
+    await ctx.send(
+        f"🗂️ **Name cache:** {stats['local_hits']:,} member-cache hits, {stats['cache_hits']:,} LRU hits, "
+        f"{stats['misses']:,} misses ({names.hit_rate:.1%} hit rate)\n"
+        f"🌐 API calls: {stats['api_calls']:,} ({stats['errors']} failed)"
+    )
+
+@bot.command()
+async def lockstats(ctx):
+    author_id = str(ctx.author.id)
+    if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
+        await ctx.send("⛔ Only the server owner can view lock stats.")
+        return
+
+    stats = account_locks.stats.as_dict()
+    await ctx.send(
+        f"🔒 **Account locks:** {stats['acquisitions']:,} acquired, {stats['contended']:,} contended, "
+        f"{len(account_locks)} held right now\n"
+        f"⏱️ Wait when contended: avg {stats['avg_wait_ms']}ms, max {stats['max_wait_ms']}ms"
+    )
+
+@bot.command()
+async def memory(ctx):
+    author_id = str(ctx.author.id)
+    if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
+        await ctx.send("⛔ Only the server owner can view memory usage.")
+        return
+
+    lookups = bot.member_lookup.stats
+    await ctx.send(
+        f"🧠 **Memory budget:** {memory_budget.describe()}\n"
+        f"{memory_report.render()}\n"
+        f"👥 Member lookups: {lookups['local_hits']:,} cached, {lookups['cache_hits']:,} LRU hits, "
+        f"{lookups['api_calls']:,} fetched ({lookups['errors']} failed)"
+    )
+
+@bot.command()
+async def stats(ctx, command_name: str = None):
+    author_id = str(ctx.author.id)
+    if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
+        await ctx.send("⛔ Only the server owner can view command stats.")
+        return
+
+    if not command_stats.commands:
+        await ctx.send("📈 No commands have been run yet.")
+        return
+
+    if command_name:
+        record = command_stats.commands.get(command_name)
+        if record is None:
+            await ctx.send(f"❌ No stats for `{command_name}` yet.")
+            return
+        msg = f"📈 **!{command_name}**: {record.calls:,} calls, {record.errors:,} errors, {record.rate() * 60:.1f}/min\n"
+        for phase, histogram in record.histograms.items():
+            avg = histogram.total / histogram.count * 1000 if histogram.count else 0
+            msg += (f"• {phase}: avg {avg:.1f}ms, p50 ≤{histogram.quantile(0.5) * 1000:g}ms, "
+                    f"p99 ≤{histogram.quantile(0.99) * 1000:g}ms\n")
+        await ctx.send(msg)
+        return
+
+    # Busiest commands first
+    ranked = sorted(command_stats.commands.items(), key=lambda item: item[1].calls, reverse=True)
+    msg = "📈 **Command stats** (use `!stats <command>` for the phase breakdown):\n"
+    for name, record in ranked[:15]:
+        total = record.histograms["total"]
+        msg += (f"• `!{name}`: {record.calls:,} calls, {record.errors} errors, {record.rate() * 60:.1f}/min, "
+                f"p50 ≤{total.quantile(0.5) * 1000:g}ms, p99 ≤{total.quantile(0.99) * 1000:g}ms\n")
+    await ctx.send(msg)
+
+MAX_PROFILE_SECONDS = 60
+profile_running = False
+
+@bot.command()
+async def profile(ctx, seconds: int = 10):
+    global profile_running
+    author_id = str(ctx.author.id)
+    if author_id != "859193969061920788":  # 👈 Replace with your Discord ID
+        await ctx.send("⛔ Only the server owner can profile the bot.")
+        return
+
+    if seconds < 1 or seconds > MAX_PROFILE_SECONDS:
+        await ctx.send(f"❌ Profile for between 1 and {MAX_PROFILE_SECONDS} seconds.")
+        return
+
+    if profile_running:
+        await ctx.send("⏳ A profile is already running.")
+        return
+
+    profile_running = True
+    try:
+        await ctx.send(f"🔬 Profiling the event loop for {seconds}s...")
+        report = await profile_event_loop(seconds)
+    finally:
+        profile_running = False
+
+    summary = report.split("\n\n", 2)
+    await ctx.send(
+        f"🔬 {summary[0]}\n{summary[1] if len(summary) > 1 else ''}",
+        file=discord.File(io.BytesIO(report.encode("utf-8")), filename="profile.txt"),
+    )
+
+startup.record("setup", startup.phases["imports"][1], time.perf_counter())
+
+if __name__ == "__main__":
+    # All discord.* loggers (the bot's own modules included) go through
+    # logger.py, which can log through a queue, see LOG_ASYNC
+    setup_logger("discord")
+    startup.begin("login")
+    bot.run(os.getenv("DISCORD_TOKEN"), log_handler=None)
+    # Write out anything changed since the last periodic flush
+    store.flush_sync()
@@ -0,0 +1,113 @@
+from ranking import IndexableSkipList
+
+
+class Market:
+    """Market listings addressed by stable IDs.
+
+    ``listings`` maps listing IDs (as strings, so the dict can be stored as
+    JSON) to ``{"name", "price", "seller"}`` records. Secondary indexes by
+    seller, by name and by price are kept in step with every add and remove,
+    so lookups never scan the whole market.
+    """
+
+    def __init__(self, data=None):
+        self.listings = {}
+        self.migrated = False
+        self._by_seller = {}
+        self._by_name = {}
+        self._by_price = IndexableSkipList()
+        self._next_id = 1
+
+        if isinstance(data, list):
+            # Old market.json files were a plain list addressed by position
+            self.migrated = bool(data)
+            for item in data:
+                self._insert(str(self._next_id), dict(item))
+        elif data:
+            for listing_id, item in data.items():
+                self._insert(listing_id, item)
+
+    def __len__(self):
+        return len(self.listings)
+
+    def __bool__(self):
+        return bool(self.listings)
+
+    def _insert(self, listing_id, item):
+        self.listings[listing_id] = item
+        self._by_seller.setdefault(item["seller"], set()).add(listing_id)
+        self._by_name.setdefault(item["name"].lower(), set()).add(listing_id)
+        self._by_price.insert((item["price"], int(listing_id)))
+        self._next_id = max(self._next_id, int(listing_id) + 1)
+
+    def add(self, name, price, seller):
+        """List an item and return its new ID."""
+        listing_id = str(self._next_id)
+        self._insert(listing_id, {"name": name, "price": price, "seller": seller})
+        return listing_id
+
+    def get(self, listing_id):
+        return self.listings.get(str(listing_id))
+
+    def remove(self, listing_id):
+        """Take a listing off the market and return it, or None if it's gone."""
+        listing_id = str(listing_id)
+        item = self.listings.pop(listing_id, None)
+        if item is None:
+            return None
+        self._discard(self._by_seller, item["seller"], listing_id)
+        self._discard(self._by_name, item["name"].lower(), listing_id)
+        self._by_price.remove((item["price"], int(listing_id)))
+        return item
+
+    @staticmethod
+    def _discard(index, key, listing_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(listing_id)
+            if not ids:
+                del index[key]
+
+    def by_seller(self, seller):
+        return sorted(self._by_seller.get(seller, ()), key=int)
+
+    def by_name(self, name):
+        return sorted(self._by_name.get(name.lower(), ()), key=int)
+
+    def search(self, seller=None, name=None, min_price=None, max_price=None):
+        """Return ``(listing_id, item)`` pairs matching every given filter.
+
+        Results are ordered by price when a price filter is given and by
+        listing ID otherwise. The narrowest available index is used to find
+        candidates before the remaining filters are applied.
+        """
+        if min_price is not None or max_price is not None:
+            if seller is None and name is None:
+                start = (min_price if min_price is not None else float("-inf"), 0)
+                results = []
+                for price, listing_id in self._by_price.iter_from(start):
+                    if max_price is not None and price > max_price:
+                        break
+                    results.append((str(listing_id), self.listings[str(listing_id)]))
+                return results
+
+        if seller is not None:
+            ids = self.by_seller(seller)
+        elif name is not None:
+            ids = self.by_name(name)
+        else:
+            ids = self.listings.keys()
+
+        results = []
+        for listing_id in ids:
+            item = self.listings[listing_id]
+            if name is not None and item["name"].lower() != name.lower():
+                continue
+            if min_price is not None and item["price"] < min_price:
+                continue
+            if max_price is not None and item["price"] > max_price:
+                continue
+            results.append((listing_id, item))
+        if min_price is not None or max_price is not None:
+            results.sort(key=lambda pair: (pair[1]["price"], int(pair[0])))
+        return results
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+
+import discord
+from discord.ext import commands
+
+_MEMBER_ID = re.compile(r"<@!?(\d+)>$|(\d{15,20})$")
+
+
+class MemberLookup:
+    """Guild members for when discord.py isn't caching them.
+
+    With a memory budget (see memory.py) the member cache is small or off,
+    so ``guild.get_member`` mostly misses. Lookups here try it first, then a
+    bounded LRU cache with a TTL, and only then ``guild.fetch_member``.
+    Duplicate in-flight fetches for the same member share one request.
+    """
+
+    def __init__(self, maxsize=1000, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.logger = logging.getLogger('discord.member_cache')
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.stats = {"local_hits": 0, "cache_hits": 0, "misses": 0, "api_calls": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._cache)
+
+    def values(self):
+        return [member for member, _ in self._cache.values()]
+
+    def remember(self, member):
+        """Keep a member found some other way (e.g. by a converter)."""
+        self._cache[(member.guild.id, member.id)] = (member, time.monotonic() + self.ttl)
+        self._cache.move_to_end((member.guild.id, member.id))
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        member, expires = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return member
+
+    async def _fetch(self, guild, user_id):
+        self.stats["api_calls"] += 1
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        except discord.HTTPException:
+            self.stats["errors"] += 1
+            self.logger.warning(f"Failed to fetch member {user_id} of guild {guild.id}")
+            return None
+        self.remember(member)
+        return member
+
+    async def get(self, guild, user_id):
+        """Return ``user_id``'s member object in ``guild``, or None if they aren't a member."""
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.stats["local_hits"] += 1
+            return member
+
+        key = (guild.id, user_id)
+        member = self._cached(key)
+        if member is not None:
+            self.stats["cache_hits"] += 1
+            return member
+
+        self.stats["misses"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(guild, user_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await task
+
+    def forget_guild(self, guild):
+        for key in [key for key in self._cache if key[0] == guild.id]:
+            del self._cache[key]
+
+
+class CachedMember(commands.Converter):
+    """``discord.Member`` converter that resolves mentions and IDs through the bot's :class:`MemberLookup`.
+
+    Names and anything else fall back to discord.py's MemberConverter.
+    """
+
+    async def convert(self, ctx, argument):
+        lookup = getattr(ctx.bot, "member_lookup", None)
+        match = _MEMBER_ID.match(argument)
+        if lookup is not None and match is not None and ctx.guild is not None:
+            member = await lookup.get(ctx.guild, int(match.group(1) or match.group(2)))
+            if member is not None:
+                return member
+        member = await commands.MemberConverter().convert(ctx, argument)
+        if lookup is not None and ctx.guild is not None:
+            lookup.remember(member)
+        return member
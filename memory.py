@@ -0,0 +1,215 @@
+import itertools
+import os
+import sys
+
+import discord
+
+# Memory budget profiles, picked with MEMORY_BUDGET:
+#   default: discord.py's defaults (chunking follows the members intent)
+#   low: no member cache, no guild chunking, 100 cached messages, no typing
+#        or voice state events
+#   minimal: like low, without a message cache at all
+PROFILES = {
+    "default": {"member_cache": "default", "chunk_guilds": None, "max_messages": 1000, "trim_intents": False},
+    "low": {"member_cache": "none", "chunk_guilds": False, "max_messages": 100, "trim_intents": True},
+    "minimal": {"member_cache": "none", "chunk_guilds": False, "max_messages": None, "trim_intents": True},
+}
+
+# Objects (and attributes) the size estimate doesn't descend into: they are
+# shared by everything and would be counted once per sampled object
+_SHARED_TYPES = (discord.Client, discord.Guild, type, type(sys))
+_SHARED_ATTRIBUTES = {"_state", "guild", "channel", "_client", "bot"}
+_MISSING = object()
+
+
+class MemoryBudget:
+    """How much of Discord's state the bot keeps in memory.
+
+    Each setting comes from the MEMORY_BUDGET profile unless its own
+    environment variable overrides it:
+
+        MEMBER_CACHE: default, none, voice or joined (discord.MemberCacheFlags)
+        CHUNK_GUILDS: 1 to request every guild's member list at startup
+            (needs the members intent; defaults to whether it's enabled)
+        MESSAGE_CACHE_SIZE: Messages kept for edit/delete events (0 = none)
+    """
+
+    def __init__(self, profile="default", member_cache=None, chunk_guilds=None, max_messages=False):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown memory budget: {profile}")
+        settings = PROFILES[profile]
+        self.profile = profile
+        self.member_cache = member_cache or settings["member_cache"]
+        self.chunk_guilds = settings["chunk_guilds"] if chunk_guilds is None else chunk_guilds
+        self.max_messages = settings["max_messages"] if max_messages is False else max_messages
+        self.trim_intents = settings["trim_intents"]
+
+    @classmethod
+    def from_env(cls):
+        chunk_guilds = os.getenv("CHUNK_GUILDS")
+        max_messages = os.getenv("MESSAGE_CACHE_SIZE")
+        return cls(
+            os.getenv("MEMORY_BUDGET", "default"),
+            member_cache=os.getenv("MEMBER_CACHE"),
+            chunk_guilds=None if chunk_guilds is None else chunk_guilds.lower() in ("1", "true", "yes"),
+            max_messages=False if max_messages is None else (int(max_messages) or None),
+        )
+
+    def apply(self, intents):
+        """Turn off the events the bot doesn't use under a budget. Returns ``intents``."""
+        if self.trim_intents:
+            # Voice states are cached per member, typing events are just noise
+            intents.voice_states = False
+            intents.typing = False
+        return intents
+
+    def check(self, intents):
+        """
+        Make sure the settings only use what ``intents`` receives.
+
+        Raises:
+            ValueError: A setting needs an intent that isn't enabled
+        """
+        if self.chunk_guilds and not intents.members:
+            raise ValueError("CHUNK_GUILDS=1 needs the members intent, which the bot doesn't request")
+        if self.member_cache == "joined" and not intents.members:
+            raise ValueError("MEMBER_CACHE=joined needs the members intent, which the bot doesn't request")
+        if self.member_cache == "voice" and not intents.voice_states:
+            reason = f" (MEMORY_BUDGET={self.profile} turns it off)" if self.trim_intents else ""
+            raise ValueError(f"MEMBER_CACHE=voice needs the voice_states intent{reason}")
+
+    def member_cache_flags(self, intents):
+        if self.member_cache == "default":
+            return discord.MemberCacheFlags.from_intents(intents)
+        if self.member_cache == "none":
+            return discord.MemberCacheFlags.none()
+        if self.member_cache in ("voice", "joined"):
+            flags = discord.MemberCacheFlags.none()
+            setattr(flags, self.member_cache, True)
+            return flags
+        raise ValueError(f"Unknown member cache setting: {self.member_cache}")
+
+    def client_options(self, intents):
+        """Keyword arguments for ``commands.Bot`` (after :meth:`apply`).
+
+        Raises:
+            ValueError: See :meth:`check`
+        """
+        if self.chunk_guilds is None:
+            # discord.py's own default
+            self.chunk_guilds = intents.members
+        self.check(intents)
+        return {
+            "member_cache_flags": self.member_cache_flags(intents),
+            "chunk_guilds_at_startup": self.chunk_guilds,
+            "max_messages": self.max_messages,
+        }
+
+    def describe(self):
+        messages = f"{self.max_messages:,}" if self.max_messages else "off"
+        chunking = "on" if self.chunk_guilds else "off"
+        return f"{self.profile} (member cache {self.member_cache}, chunking {chunking}, message cache {messages})"
+
+
+def process_rss():
+    """
+    Resident set size of this process.
+
+    Returns:
+        tuple: (bytes, True if it's the current RSS or False for the peak),
+        or (None, False) where neither can be read
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"), True
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, False
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return (peak if sys.platform == "darwin" else peak * 1024), False
+
+
+def deep_size(obj, seen=None, depth=4):
+    """Approximate bytes used by ``obj`` and what it references (not shared state)."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if depth <= 0:
+        return size
+    depth -= 1
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen, depth) + deep_size(v, seen, depth) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen, depth) for item in obj)
+    elif not isinstance(obj, (str, bytes, int, float, bool)):
+        if hasattr(obj, "__dict__"):
+            size += deep_size(
+                {k: v for k, v in vars(obj).items() if k not in _SHARED_ATTRIBUTES}, seen, depth
+            )
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                value = getattr(obj, name, _MISSING) if name not in _SHARED_ATTRIBUTES else _MISSING
+                if value is not _MISSING and name != "__dict__":
+                    size += deep_size(value, seen, depth)
+    return size
+
+
+class MemoryReport:
+    """Estimates how much memory each of the bot's caches is using.
+
+    Each cache is registered with a function returning its entry count and
+    one returning (an iterable of) its entries. An entry's size is measured
+    on a sample with :func:`deep_size` and multiplied by the count, so the
+    report stays cheap for caches with millions of entries. The estimates
+    are then set against the process RSS.
+    """
+
+    def __init__(self, sample=50):
+        self.sample = sample
+        self._caches = []
+
+    def register(self, name, count, entries):
+        self._caches.append((name, count, entries))
+
+    def estimate(self):
+        """Return ``[(name, entries, estimated bytes)]``, largest first."""
+        rows = []
+        for name, count, entries in self._caches:
+            n = count()
+            sampled = list(itertools.islice(entries(), self.sample)) if n else []
+            # One ``seen`` set for the whole sample, so objects the entries
+            # share (dict keys, default values) are only counted once
+            seen = set()
+            average = sum(deep_size(entry, seen) for entry in sampled) / len(sampled) if sampled else 0
+            rows.append((name, n, int(average * n)))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def render(self):
+        rss, current = process_rss()
+        rows = self.estimate()
+        lines = []
+        for name, n, size in rows:
+            share = f" ({size / rss:.1%} of RSS)" if rss else ""
+            lines.append(f"• {name}: {n:,} entries ≈ {_format_bytes(size)}{share}")
+        if rss:
+            label = "RSS" if current else "Peak RSS"
+            attributed = sum(size for _, _, size in rows)
+            lines.insert(0, f"**{label}: {_format_bytes(rss)}**")
+            lines.append(f"• Everything else (interpreter, libraries, buffers): ≈ {_format_bytes(max(rss - attributed, 0))}")
+        return "\n".join(lines)
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GiB"
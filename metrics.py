@@ -0,0 +1,63 @@
+import math
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Collects metrics from the bot's subsystems and renders them for Prometheus.
+
+    Each collector is a callable returning an iterable of
+    ``(name, kind, help, samples)`` tuples, where ``kind`` is "gauge",
+    "counter" or "histogram" and ``samples`` is a list of
+    ``(sample_name, labels, value)``. Collectors are only called when the
+    metrics are scraped, so registering one costs nothing on the hot path.
+    """
+
+    def __init__(self, prefix="discord_bot"):
+        self.prefix = prefix
+        self._collectors = []
+
+    def register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def collect(self):
+        for collector in self._collectors:
+            yield from collector()
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, kind, help_text, samples in self.collect():
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{self.prefix}_{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def gauge(name, help_text, value, labels=None):
+    """Build a single-sample gauge for a collector to return."""
+    return (name, "gauge", help_text, [(name, labels, value)])
+
+
+def counter(name, help_text, value, labels=None):
+    """Build a single-sample counter for a collector to return."""
+    return (name, "counter", help_text, [(name, labels, value)])
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import discord
+
+
+class NameResolver:
+    """Turns user IDs into names with as few API calls as possible.
+
+    Lookups try the guild member cache and ``bot.get_user`` first, then a
+    bounded LRU cache with a TTL, and only then ``bot.fetch_user``. Misses are
+    fetched concurrently, capped by ``concurrency``, and duplicate in-flight
+    fetches for the same ID share one request.
+    """
+
+    def __init__(self, bot, maxsize=5000, ttl=600, concurrency=5):
+        self.bot = bot
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.logger = logging.getLogger('discord.name_cache')
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {"local_hits": 0, "cache_hits": 0, "misses": 0, "api_calls": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._cache)
+
+    def values(self):
+        return [name for name, _ in self._cache.values()]
+
+    def _local(self, user_id, guild):
+        if guild is not None:
+            member = guild.get_member(user_id)
+            if member is not None:
+                return member.name
+        user = self.bot.get_user(user_id)
+        return user.name if user is not None else None
+
+    def _cached(self, user_id):
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return False, None
+        name, expires = entry
+        if expires < time.monotonic():
+            del self._cache[user_id]
+            return False, None
+        self._cache.move_to_end(user_id)
+        return True, name
+
+    def _store(self, user_id, name, ttl):
+        self._cache[user_id] = (name, time.monotonic() + ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, user_id):
+        async with self._semaphore:
+            self.stats["api_calls"] += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                # Remember deleted accounts too, but not for as long
+                self._store(user_id, None, self.ttl / 10)
+                return None
+            except discord.HTTPException:
+                self.stats["errors"] += 1
+                self.logger.warning(f"Failed to fetch user {user_id}")
+                return None
+        self._store(user_id, user.name, self.ttl)
+        return user.name
+
+    async def resolve(self, user_id, guild=None):
+        """Return the name for ``user_id``, or None if it can't be found."""
+        return (await self.resolve_many([user_id], guild))[int(user_id)]
+
+    async def resolve_many(self, user_ids, guild=None):
+        """Resolve several IDs at once.
+
+        Args:
+            user_ids (iterable): User IDs as ints or strings
+            guild (discord.Guild): Guild whose member cache should be checked first
+
+        Returns:
+            dict: Maps each ID (as int) to its name, or None if unknown
+        """
+        names = {}
+        pending = {}
+        for raw_id in user_ids:
+            user_id = int(raw_id)
+            if user_id in names or user_id in pending:
+                continue
+
+            name = self._local(user_id, guild)
+            if name is not None:
+                self.stats["local_hits"] += 1
+                names[user_id] = name
+                continue
+
+            found, name = self._cached(user_id)
+            if found:
+                self.stats["cache_hits"] += 1
+                names[user_id] = name
+                continue
+
+            self.stats["misses"] += 1
+            task = self._inflight.get(user_id)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch(user_id))
+                self._inflight[user_id] = task
+                task.add_done_callback(lambda _, uid=user_id: self._inflight.pop(uid, None))
+            pending[user_id] = task
+
+        if pending:
+            results = await asyncio.gather(*pending.values())
+            names.update(zip(pending.keys(), results))
+        return names
+
+    @property
+    def hit_rate(self):
+        hits = self.stats["local_hits"] + self.stats["cache_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
@@ -0,0 +1,205 @@
+import heapq
+
+BUY = "b"
+SELL = "a"
+
+
+class OrderBook:
+    """Resting limit orders for one item.
+
+    ``bids`` is a max-heap and ``asks`` a min-heap of ``(price key, order
+    number, order ID)``, so the best order on each side is ``heap[0]`` and
+    ties on price go to the older order. Cancelled and filled orders are
+    popped as soon as they reach the top, so the top is always live.
+    ``levels`` keeps the total quantity at each price for the depth view.
+    """
+
+    __slots__ = ("bids", "asks", "bid_levels", "ask_levels", "dead")
+
+    def __init__(self):
+        self.bids = []
+        self.asks = []
+        self.bid_levels = {}
+        self.ask_levels = {}
+        self.dead = 0  # cancelled entries still buried in a heap
+
+    def heap(self, side):
+        return self.bids if side == BUY else self.asks
+
+    def levels(self, side):
+        return self.bid_levels if side == BUY else self.ask_levels
+
+    def __bool__(self):
+        return bool(self.bid_levels or self.ask_levels)
+
+
+class Exchange:
+    """Order books for every item traded in one economy, matched with price-time priority.
+
+    ``orders`` maps order IDs (as strings, so the dict can be stored as
+    JSON) to ``{"i": item ID, "s": "b" (buy) or "a" (sell), "p": limit
+    price, "q": quantity left, "u": user ID}``; the books are rebuilt from
+    it on load. An incoming order trades against the best opposite orders
+    for as long as the prices cross, at the resting order's price, and
+    whatever is left rests on the book. Adding an order is O(log n) per
+    fill, the best bid/ask is O(1). Escrow is the caller's job, see
+    :meth:`economy.Economy.place_order`.
+    """
+
+    def __init__(self, orders=None):
+        self.orders = orders if orders is not None else {}
+        self._books = {}
+        self._by_user = {}
+        self._next_id = max((int(order_id) for order_id in self.orders), default=0) + 1
+        for order_id, order in self.orders.items():
+            self._index(order_id, order)
+        for book in self._books.values():
+            heapq.heapify(book.bids)
+            heapq.heapify(book.asks)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def _book(self, item_id):
+        book = self._books.get(item_id)
+        if book is None:
+            book = self._books[item_id] = OrderBook()
+        return book
+
+    def _index(self, order_id, order, push=False):
+        book = self._book(order["i"])
+        key = -order["p"] if order["s"] == BUY else order["p"]
+        entry = (key, int(order_id), order_id)
+        if push:
+            heapq.heappush(book.heap(order["s"]), entry)
+        else:
+            book.heap(order["s"]).append(entry)  # heapified after loading
+        levels = book.levels(order["s"])
+        levels[order["p"]] = levels.get(order["p"], 0) + order["q"]
+        self._by_user.setdefault(order["u"], set()).add(order_id)
+
+    def _take(self, book, order_id, order, quantity):
+        """Remove ``quantity`` of a resting order from the book's levels (and the order if it's used up)."""
+        order["q"] -= quantity
+        levels = book.levels(order["s"])
+        levels[order["p"]] -= quantity
+        if not levels[order["p"]]:
+            del levels[order["p"]]
+        if not order["q"]:
+            del self.orders[order_id]
+            ids = self._by_user.get(order["u"])
+            if ids is not None:
+                ids.discard(order_id)
+                if not ids:
+                    del self._by_user[order["u"]]
+
+    def _prune(self, item_id, book, side, drop_empty=True):
+        """Pop cancelled orders off the top of one side, and drop the book once it's empty."""
+        heap = book.heap(side)
+        while heap and heap[0][2] not in self.orders:
+            heapq.heappop(heap)
+            book.dead = max(book.dead - 1, 0)
+        # Rebuild once most of the heap is dead entries
+        if book.dead > 64 and book.dead > len(heap) // 2:
+            book.bids[:] = [entry for entry in book.bids if entry[2] in self.orders]
+            book.asks[:] = [entry for entry in book.asks if entry[2] in self.orders]
+            heapq.heapify(book.bids)
+            heapq.heapify(book.asks)
+            book.dead = 0
+        if drop_empty and not book:
+            del self._books[item_id]
+
+    def best(self, item_id, side):
+        """Return ``(price, order ID)`` of the best buy or sell order, or None. O(1)."""
+        book = self._books.get(item_id)
+        heap = book.heap(side) if book is not None else None
+        if not heap:
+            return None
+        key, _, order_id = heap[0]
+        return (-key if side == BUY else key), order_id
+
+    def best_bid(self, item_id):
+        return self.best(item_id, BUY)
+
+    def best_ask(self, item_id):
+        return self.best(item_id, SELL)
+
+    def match(self, user_id, item_id, side, price, quantity):
+        """
+        Trade an incoming limit order against the book and rest what's left.
+
+        Args:
+            user_id (str): Who placed the order
+            item_id (str): Catalogue ID of the item
+            side (str): BUY or SELL
+            price (int): Limit price per item
+            quantity (int): Number of items
+
+        Returns:
+            tuple: (ID of the order left resting or None if it filled
+            completely, list of ``(resting order ID, counterparty, quantity,
+            price)`` fills in the order they happened)
+        """
+        book = self._book(item_id)
+        opposite = SELL if side == BUY else BUY
+        heap = book.heap(opposite)
+        fills = []
+        while quantity:
+            self._prune(item_id, book, opposite, drop_empty=False)
+            if not heap:
+                break
+            resting_id = heap[0][2]
+            resting = self.orders[resting_id]
+            if (resting["p"] > price) if side == BUY else (resting["p"] < price):
+                break
+            traded = min(quantity, resting["q"])
+            fills.append((resting_id, resting["u"], traded, resting["p"]))
+            quantity -= traded
+            self._take(book, resting_id, resting, traded)
+            if resting_id not in self.orders:
+                heapq.heappop(heap)
+
+        order_id = None
+        if quantity:
+            order_id = str(self._next_id)
+            self._next_id += 1
+            order = {"i": item_id, "s": side, "p": price, "q": quantity, "u": user_id}
+            self.orders[order_id] = order
+            self._index(order_id, order, push=True)
+        else:
+            self._prune(item_id, book, opposite)
+        return order_id, fills
+
+    def cancel(self, order_id):
+        """Take an order off the book. Returns the order (with the quantity left), or None."""
+        order_id = str(order_id)
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        order = dict(order)
+        book = self._books[order["i"]]
+        self._take(book, order_id, self.orders[order_id], order["q"])
+        book.dead += 1
+        self._prune(order["i"], book, order["s"])
+        return order
+
+    def get(self, order_id):
+        return self.orders.get(str(order_id))
+
+    def by_user(self, user_id):
+        """IDs of ``user_id``'s resting orders, oldest first."""
+        return sorted(self._by_user.get(user_id, ()), key=int)
+
+    def depth(self, item_id, levels=10):
+        """
+        Aggregated quantity at the best price levels of an item's book.
+
+        Returns:
+            tuple: (bids as ``[(price, quantity)]`` best first, asks the same)
+        """
+        book = self._books.get(item_id)
+        if book is None:
+            return [], []
+        bids = heapq.nlargest(levels, book.bid_levels.items())
+        asks = heapq.nsmallest(levels, book.ask_levels.items())
+        return bids, asks
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+class JsonBackend:
+    """Stores each data set as a JSON file on disk.
+
+    Dict-shaped data (like users.json) keeps a cache of encoded records so a
+    flush only re-encodes the records that were marked dirty since the last
+    flush. Everything else is re-encoded in full.
+    """
+
+    def __init__(self, fsync="always"):
+        self.fsync = fsync
+        self._fragments = {}
+
+    def load(self, filename, default):
+        try:
+            with open(filename, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def prepare(self, filename, data, dirty_keys):
+        """Encode ``data`` for writing. Runs on the event loop."""
+        if not isinstance(data, dict) or dirty_keys is None:
+            self._fragments.pop(filename, None)
+            if isinstance(data, dict):
+                self._fragments[filename] = {k: json.dumps(v) for k, v in data.items()}
+            return json.dumps(data).encode("utf-8")
+
+        fragments = self._fragments.setdefault(filename, {})
+        if not fragments and data:
+            fragments.update((k, json.dumps(v)) for k, v in data.items())
+        for key in dirty_keys:
+            if key in data:
+                fragments[key] = json.dumps(data[key])
+            else:
+                fragments.pop(key, None)
+
+        body = ", ".join(f"{json.dumps(k)}: {v}" for k, v in fragments.items())
+        return ("{" + body + "}").encode("utf-8")
+
+    def write(self, filename, payload):
+        """Atomically replace ``filename`` with ``payload``. Runs in a worker thread."""
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+                if self.fsync == "always":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, filename)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        if self.fsync == "always" and hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(directory, os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return len(payload)
+
+    def forget(self, filename):
+        """Drop the cached encoding of a data set that is no longer registered."""
+        self._fragments.pop(filename, None)
+
+
+def make_backend(kind="json", fsync="always", sqlite_path="economy.db", journal_dir="journal"):
+    """Create the storage backend named by ``kind`` ("json", "sqlite" or "journal")."""
+    if kind == "sqlite":
+        from sqlite_backend import SqliteBackend
+        return SqliteBackend(sqlite_path, fsync=fsync)
+    if kind == "journal":
+        from journal import JournalBackend
+        return JournalBackend(journal_dir, fsync=fsync)
+    if kind != "json":
+        raise ValueError(f"Unknown storage backend: {kind}")
+    return JsonBackend(fsync=fsync)
+
+
+class FlushMetrics:
+    """Counters describing the write-behind flushes done so far."""
+
+    def __init__(self):
+        self.flushes = 0
+        self.failures = 0
+        self.bytes_written = 0
+        self.last_bytes = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def record(self, latency, written):
+        self.flushes += 1
+        self.bytes_written += written
+        self.last_bytes = written
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+
+    def as_dict(self):
+        avg = self.total_latency / self.flushes if self.flushes else 0.0
+        return {
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "bytes_written": self.bytes_written,
+            "last_bytes": self.last_bytes,
+            "last_latency_ms": round(self.last_latency * 1000, 2),
+            "avg_latency_ms": round(avg * 1000, 2),
+            "max_latency_ms": round(self.max_latency * 1000, 2),
+        }
+
+
+class WriteBehindStore:
+    """Coalesces saves into periodic batched flushes off the event loop.
+
+    Commands call :meth:`mark_dirty` instead of writing files themselves. A
+    background task flushes everything that changed every ``interval``
+    seconds, and :meth:`flush_sync` writes any leftovers on shutdown.
+    """
+
+    def __init__(self, backend, interval=5.0):
+        self.backend = backend
+        self.interval = interval
+        self.metrics = FlushMetrics()
+        self.logger = logging.getLogger('discord.persistence')
+        self._data = {}
+        self._dirty = {}
+        self._lock = None
+        self._task = None
+
+    def register(self, filename, data):
+        """Track ``data`` as the in-memory copy of ``filename``."""
+        self._data[filename] = data
+
+    def unregister(self, filename):
+        """Stop tracking ``filename``; it must not have unflushed changes."""
+        if filename in self._dirty:
+            raise ValueError(f"{filename} has unflushed changes")
+        self._data.pop(filename, None)
+        forget = getattr(self.backend, "forget", None)
+        if forget is not None:
+            forget(filename)
+
+    def is_dirty(self, filename):
+        return filename in self._dirty
+
+    @property
+    def flushing(self):
+        """True while a flush is writing (its changes aren't on disk yet)."""
+        return self._lock is not None and self._lock.locked()
+
+    def mark_dirty(self, filename, key=None):
+        """Schedule ``filename`` for the next flush.
+
+        Args:
+            filename (str): File the data set is stored in
+            key: Record that changed, or None if the whole data set changed
+        """
+        # Backends that keep a history (see journal.py) record every change, not just the last one
+        capture = getattr(self.backend, "capture", None)
+        if capture is not None:
+            capture(filename, self._data[filename], key)
+        self._mark(filename, key)
+
+    def _mark(self, filename, key):
+        if key is None or filename in self._dirty and self._dirty[filename] is None:
+            self._dirty[filename] = None
+        else:
+            self._dirty.setdefault(filename, set()).add(key)
+
+    @property
+    def pending(self):
+        """Number of data sets waiting to be flushed."""
+        return len(self._dirty)
+
+    def start(self):
+        """Start the periodic flush task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out anything still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                self.logger.exception("Write-behind flush failed")
+
+    def _take_batch(self):
+        dirty, self._dirty = self._dirty, {}
+        batch = []
+        for filename, keys in dirty.items():
+            payload = self.backend.prepare(filename, self._data[filename], keys)
+            batch.append((filename, keys, payload))
+        return batch
+
+    def _restore(self, batch):
+        for filename, keys, _ in batch:
+            if keys is None:
+                self._mark(filename, None)
+            else:
+                for key in keys:
+                    self._mark(filename, key)
+
+    def _write_batch(self, batch):
+        return sum(self.backend.write(filename, payload) for filename, _, payload in batch)
+
+    async def flush(self):
+        """Write every dirty data set, with the file I/O in a worker thread."""
+        if not self._dirty:
+            return
+        async with self._lock or asyncio.Lock():
+            batch = self._take_batch()
+            start = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self._write_batch, batch)
+            except Exception:
+                self.metrics.failures += 1
+                self._restore(batch)
+                raise
+            self._finish(start, written, len(batch))
+
+    def flush_sync(self):
+        """Write every dirty data set from the calling thread (used at shutdown)."""
+        if not self._dirty:
+            return
+        batch = self._take_batch()
+        start = time.perf_counter()
+        try:
+            written = self._write_batch(batch)
+        except Exception:
+            self.metrics.failures += 1
+            self._restore(batch)
+            raise
+        self._finish(start, written, len(batch))
+
+    def _finish(self, start, written, files):
+        latency = time.perf_counter() - start
+        self.metrics.record(latency, written)
+        self.logger.debug(f"Flushed {files} file(s), {written} bytes in {latency * 1000:.1f}ms")
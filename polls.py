@@ -0,0 +1,273 @@
+import heapq
+import re
+import time
+
+from metrics import gauge
+
+# Poll records are stored with short keys, one record per poll number:
+#   m: message ID         c: channel ID          g: guild ID (None in DMs)
+#   a: author ID          q: question            o: option labels
+#   r: option emojis      s: 1 for one vote per user
+#   d: closing time (None = open until closed by hand)
+#   v: {user ID: bitmask of the options they voted for}, while open
+#   t: votes per option and n: number of voters, once closed
+#   z: when it closed
+
+_DURATION = re.compile(r"(\d+)([smhd])")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text):
+    """
+    Parse a duration like ``90s``, ``10m``, ``2h`` or ``1d12h``.
+
+    Returns:
+        int: Seconds
+
+    Raises:
+        ValueError: ``text`` isn't a duration
+    """
+    text = text.lower()
+    parts = _DURATION.findall(text)
+    if not parts or "".join(n + unit for n, unit in parts) != text:
+        raise ValueError(f"Invalid duration: {text}")
+    return sum(int(n) * _UNITS[unit] for n, unit in parts)
+
+
+class PollStore:
+    """Live vote tallies for reaction polls.
+
+    Raw reaction add/remove events update a poll's per-option counts in
+    O(1), so results never need the message (or its reactions) fetched.
+    Each voter is stored as one bitmask of the options they picked; once a
+    poll closes only the counts are kept. Closed polls are dropped after
+    ``retention`` seconds.
+    """
+
+    def __init__(self, save_json=None, filename="polls.json", retention=7 * 86400):
+        self.save_json = save_json
+        self.filename = filename
+        self.retention = retention
+        self.stats = {"created": 0, "votes": 0, "unvotes": 0, "moved": 0, "closed": 0}
+        self.data = {}
+        self._counts = {}      # poll number -> votes per option (open polls)
+        self._by_message = {}  # message ID -> poll number
+        self._deadlines = []   # heap of (closing time, poll number)
+        self._next = 1
+
+    def __len__(self):
+        return len(self._counts)
+
+    def load(self, data):
+        """Install the polls read from storage and rebuild the indexes."""
+        self.data = data
+        self._counts.clear()
+        self._by_message.clear()
+        self._deadlines.clear()
+        for key, record in data.items():
+            self._index(key, record)
+            if "z" not in record and record["d"] is not None:
+                self._deadlines.append((record["d"], key))
+        self._next = max((int(key) for key in data), default=0) + 1
+        heapq.heapify(self._deadlines)
+
+    def _index(self, key, record):
+        if "z" in record:
+            return
+        self._by_message[record["m"]] = key
+        counts = [0] * len(record["r"])
+        for mask in record["v"].values():
+            for index in range(len(counts)):
+                if mask >> index & 1:
+                    counts[index] += 1
+        self._counts[key] = counts
+
+    def _save(self, key):
+        if self.save_json is not None:
+            self.save_json(self.filename, self.data, key)
+
+    def reserve(self):
+        """Take the next poll number, so it can be shown on the poll before it's sent."""
+        key = str(self._next)
+        self._next += 1
+        return key
+
+    def create(self, key, message, author_id, question, options, emojis, single=False, duration=None):
+        """
+        Start tallying a poll that was just posted.
+
+        Args:
+            key (str): Poll number from :meth:`reserve`
+            message: The poll message (only its ID, channel and guild are used)
+            author_id (int): Who created the poll
+            question (str): The poll question
+            options (list): Option labels
+            emojis (list): Reaction emoji for each option
+            single (bool): Allow only one vote per user
+            duration (float): Seconds until the poll closes, or None
+
+        Returns:
+            dict: The poll record
+        """
+        record = {
+            "m": message.id,
+            "c": message.channel.id,
+            "g": message.guild.id if message.guild else None,
+            "a": author_id,
+            "q": question,
+            "o": list(options),
+            "r": list(emojis),
+            "s": 1 if single else 0,
+            "d": round(time.time() + duration, 3) if duration else None,
+            "v": {},
+        }
+        self.data[key] = record
+        self._index(key, record)
+        if record["d"] is not None:
+            heapq.heappush(self._deadlines, (record["d"], key))
+        self.stats["created"] += 1
+        self._save(key)
+        return record
+
+    def get(self, key):
+        return self.data.get(str(key))
+
+    def vote(self, message_id, user_id, emoji):
+        """
+        Count a reaction added to a poll.
+
+        Returns:
+            tuple: (poll record, emoji of the option the vote moved away from
+            in a one-vote poll or None), or None if the reaction isn't a vote
+        """
+        key = self._by_message.get(message_id)
+        if key is None:
+            return None
+        record = self.data[key]
+        try:
+            index = record["r"].index(emoji)
+        except ValueError:
+            return None
+        voter = str(user_id)
+        mask = record["v"].get(voter, 0)
+        if mask >> index & 1:
+            return None
+        counts = self._counts[key]
+        moved_from = None
+        if record["s"] and mask:
+            # Move the vote: a one-vote poll mask only ever has one bit set
+            previous = mask.bit_length() - 1
+            counts[previous] -= 1
+            moved_from = record["r"][previous]
+            mask = 0
+            self.stats["moved"] += 1
+        record["v"][voter] = mask | 1 << index
+        counts[index] += 1
+        self.stats["votes"] += 1
+        self._save(key)
+        return record, moved_from
+
+    def unvote(self, message_id, user_id, emoji):
+        """Count a reaction removed from a poll. Returns True if it was a vote."""
+        key = self._by_message.get(message_id)
+        if key is None:
+            return False
+        record = self.data[key]
+        try:
+            index = record["r"].index(emoji)
+        except ValueError:
+            return False
+        voter = str(user_id)
+        mask = record["v"].get(voter, 0)
+        if not mask >> index & 1:
+            # Already moved to another option (or never counted)
+            return False
+        mask &= ~(1 << index)
+        if mask:
+            record["v"][voter] = mask
+        else:
+            del record["v"][voter]
+        self._counts[key][index] -= 1
+        self.stats["unvotes"] += 1
+        self._save(key)
+        return True
+
+    def results(self, key):
+        """
+        Current tally of a poll.
+
+        Returns:
+            tuple: (votes per option, number of voters, closed), or None for
+            an unknown poll
+        """
+        key = str(key)
+        record = self.data.get(key)
+        if record is None:
+            return None
+        if "z" in record:
+            return record["t"], record["n"], True
+        return list(self._counts[key]), len(record["v"]), False
+
+    def close(self, key):
+        """Stop counting a poll and keep only its totals. Returns the record, or None."""
+        key = str(key)
+        record = self.data.get(key)
+        if record is None or "z" in record:
+            return None
+        record["t"] = self._counts.pop(key)
+        record["n"] = len(record.pop("v"))
+        record["z"] = round(time.time(), 3)
+        self._by_message.pop(record["m"], None)
+        self.stats["closed"] += 1
+        self._save(key)
+        return record
+
+    def forget_message(self, message_id):
+        """Drop the poll posted as ``message_id`` (e.g. the message was deleted)."""
+        key = self._by_message.pop(message_id, None)
+        if key is not None:
+            self._counts.pop(key, None)
+            del self.data[key]
+            self._save(key)
+
+    def due(self, now=None):
+        """
+        Take the open polls whose time is up off the deadline queue.
+
+        They keep counting votes until the caller closes them with
+        :meth:`close`, or puts them back with :meth:`postpone`.
+
+        Returns:
+            list: ``(number, record)`` of each poll
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, key = heapq.heappop(self._deadlines)
+            record = self.data.get(key)
+            if record is not None and "z" not in record:
+                due.append((key, record))
+        return due
+
+    def postpone(self, key, delay, now=None):
+        """Make a poll from :meth:`due` due again in ``delay`` seconds (its closing time stays as stored)."""
+        now = time.time() if now is None else now
+        heapq.heappush(self._deadlines, (now + delay, str(key)))
+
+    def prune(self, now=None):
+        """Drop polls closed more than ``retention`` seconds ago. Returns how many."""
+        now = time.time() if now is None else now
+        expired = [key for key, record in self.data.items() if record.get("z", now) < now - self.retention]
+        for key in expired:
+            del self.data[key]
+            self._save(key)
+        return len(expired)
+
+    def collect(self):
+        """Metrics collector for :class:`metrics.MetricsRegistry`."""
+        samples = [("poll_events_total", {"kind": kind}, value) for kind, value in self.stats.items()]
+        return [
+            gauge("polls_open", "Polls counting votes", len(self)),
+            gauge("polls_stored", "Polls kept for !pollresults", len(self.data)),
+            ("poll_events_total", "counter", "Polls created and closed, votes added, removed and moved", samples),
+        ]
@@ -0,0 +1,101 @@
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    """Samples the call stack of one thread at a fixed interval.
+
+    The sampling runs in its own daemon thread and only reads
+    ``sys._current_frames()``, so the profiled thread (the event loop) is
+    never paused or traced.
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @staticmethod
+    def _label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[stack[0]] += 1
+            for label in set(stack):
+                self.total_counts[label] += 1
+            self.stacks[";".join(reversed(stack))] += 1
+
+
+async def measure_loop_lag(seconds, interval=0.05):
+    """Sleep repeatedly for ``interval`` and record how late each wake-up was."""
+    lags = []
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    while loop.time() < deadline:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - start - interval, 0.0))
+    return lags
+
+
+async def profile_event_loop(seconds, interval=0.005, top=25):
+    """Profile the running event loop for ``seconds`` and return a text report."""
+    profiler = SamplingProfiler(threading.get_ident(), interval=interval)
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        lags = await measure_loop_lag(seconds)
+    finally:
+        profiler.stop()
+    elapsed = time.perf_counter() - started
+
+    lines = [f"Sampled the event loop for {elapsed:.1f}s: {profiler.samples:,} samples every {interval * 1000:g}ms", ""]
+
+    lags.sort()
+    if lags:
+        p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+        lines.append(
+            f"Event loop lag: avg {sum(lags) / len(lags) * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms, "
+            f"max {lags[-1] * 1000:.1f}ms over {len(lags)} probes"
+        )
+        lines.append("")
+
+    for title, counts in (("Top functions by self time", profiler.self_counts),
+                          ("Top functions by total time", profiler.total_counts)):
+        lines.append(title + ":")
+        for label, count in counts.most_common(top):
+            lines.append(f"  {count / max(profiler.samples, 1):6.1%}  {count:6,}  {label}")
+        lines.append("")
+
+    lines.append("Collapsed stacks (for flamegraph.pl / speedscope):")
+    for stack, count in profiler.stacks.most_common():
+        lines.append(f"{stack} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+import asyncio
+
+
+class PromptActive(Exception):
+    """Raised when a user who is already being asked something is asked again."""
+
+
+class PromptCancelled(Exception):
+    """Raised from :meth:`Prompt.wait` when the prompt was cancelled."""
+
+
+class Prompt:
+    """A question waiting for one user's next matching message in one channel."""
+
+    __slots__ = ("registry", "key", "check", "future")
+
+    def __init__(self, registry, key, check):
+        self.registry = registry
+        self.key = key
+        self.check = check
+        self.future = asyncio.get_running_loop().create_future()
+
+    async def wait(self, timeout):
+        """Return the answering message.
+
+        Raises:
+            asyncio.TimeoutError: No answer within ``timeout`` seconds
+            PromptCancelled: The prompt was cancelled (e.g. by ``!cancel``)
+        """
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except asyncio.TimeoutError:
+            self.registry.stats["timeouts"] += 1
+            raise
+        finally:
+            self.close()
+
+    def cancel(self):
+        if not self.future.done():
+            self.future.set_exception(PromptCancelled())
+            self.registry.stats["cancelled"] += 1
+        self.close()
+
+    def close(self):
+        """Stop waiting; safe to call more than once."""
+        self.registry._remove(self)
+
+
+class PromptRegistry:
+    """Pending interactive prompts, indexed by ``(channel_id, author_id)``.
+
+    ``bot.wait_for("message", check=...)`` runs every pending check against
+    every incoming message. Here each message is one dict lookup, whatever
+    the number of open prompts. A user can only have one prompt open at a
+    time, across all channels.
+    """
+
+    def __init__(self):
+        self._prompts = {}
+        self._by_author = {}
+        self.stats = {"opened": 0, "answered": 0, "timeouts": 0, "cancelled": 0, "rejected": 0}
+
+    def __len__(self):
+        return len(self._prompts)
+
+    def is_waiting(self, channel_id, author_id):
+        return (channel_id, author_id) in self._prompts
+
+    def open(self, channel_id, author_id, check=None, replace=False):
+        """Start waiting for ``author_id``'s next message in ``channel_id``.
+
+        Open the prompt before sending the question, so a fast answer can't
+        be missed.
+
+        Args:
+            channel_id (int): Channel the answer must be sent in
+            author_id (int): User who must answer
+            check: Optional function a message must pass to count as the answer
+            replace (bool): Cancel the user's open prompt instead of raising
+
+        Raises:
+            PromptActive: The user already has an open prompt
+        """
+        existing = self._by_author.get(author_id)
+        if existing is not None:
+            if not replace:
+                self.stats["rejected"] += 1
+                raise PromptActive(f"User {author_id} already has an open prompt")
+            existing.cancel()
+        prompt = Prompt(self, (channel_id, author_id), check)
+        self._prompts[prompt.key] = prompt
+        self._by_author[author_id] = prompt
+        self.stats["opened"] += 1
+        return prompt
+
+    async def ask(self, channel_id, author_id, timeout, check=None):
+        """Open a prompt and wait for its answer in one go."""
+        return await self.open(channel_id, author_id, check).wait(timeout)
+
+    def feed(self, message):
+        """Hand an incoming message to the prompt waiting for it.
+
+        Returns:
+            bool: True if the message answered a prompt
+        """
+        prompt = self._prompts.get((message.channel.id, message.author.id))
+        if prompt is None or prompt.future.done():
+            return False
+        if prompt.check is not None and not prompt.check(message):
+            return False
+        prompt.future.set_result(message)
+        self.stats["answered"] += 1
+        prompt.close()
+        return True
+
+    def cancel(self, author_id):
+        """Cancel ``author_id``'s open prompt, if any. Returns True if there was one."""
+        prompt = self._by_author.get(author_id)
+        if prompt is None:
+            return False
+        prompt.cancel()
+        return True
+
+    def _remove(self, prompt):
+        if self._prompts.get(prompt.key) is prompt:
+            del self._prompts[prompt.key]
+        author_id = prompt.key[1]
+        if self._by_author.get(author_id) is prompt:
+            del self._by_author[author_id]
@@ -0,0 +1,172 @@
+import random
+
+
+class _Node:
+    __slots__ = ("value", "next", "width")
+
+    def __init__(self, value, levels):
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """Sorted container with O(log n) insert, remove, rank and index lookups.
+
+    Each link stores how many items it skips over, which is what lets
+    :meth:`rank` and ``skiplist[i]`` run without walking the bottom level.
+    """
+
+    MAX_LEVELS = 32
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._levels = 1
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _random_levels(self):
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, value):
+        levels = self._random_levels()
+        self._levels = max(self._levels, levels)
+
+        # Find the last node before ``value`` on every level and the index it sits at
+        chain = [None] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS
+        node, index = self._head, 0
+        for level in reversed(range(self._levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                index += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            steps[level] = index
+
+        new = _Node(value, levels)
+        for level in range(self._levels):
+            prev = chain[level]
+            if level < levels:
+                skipped = index - steps[level]
+                new.next[level] = prev.next[level]
+                new.width[level] = prev.width[level] - skipped if prev.next[level] is not None else 1
+                prev.next[level] = new
+                prev.width[level] = skipped + 1
+            elif prev.next[level] is not None:
+                prev.width[level] += 1
+        self._size += 1
+
+    def remove(self, value):
+        chain = [None] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = node.next[0]
+        if target is None or target.value != value:
+            raise KeyError(value)
+
+        for level in range(self._levels):
+            prev = chain[level]
+            if prev.next[level] is target:
+                prev.next[level] = target.next[level]
+                prev.width[level] = prev.width[level] + target.width[level] - 1 if target.next[level] is not None else 1
+            elif prev.next[level] is not None:
+                prev.width[level] -= 1
+        self._size -= 1
+
+    def rank(self, value):
+        """Return the 0-based position of ``value``, or raise KeyError."""
+        node, index = self._head, 0
+        for level in reversed(range(self._levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                index += node.width[level]
+                node = node.next[level]
+        target = node.next[0]
+        if target is None or target.value != value:
+            raise KeyError(value)
+        return index
+
+    def iter_from(self, value):
+        """Yield items from the first one that is >= ``value`` onwards."""
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                node = node.next[level]
+        node = node.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        node, remaining = self._head, i + 1
+        for level in reversed(range(self._levels)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node.value
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+
+class LeaderboardIndex:
+    """Keeps users ordered by credits as balances change.
+
+    Entries are stored as ``(-credits, user_id)`` so the richest user comes
+    first and ties are broken by user ID.
+    """
+
+    def __init__(self, users=None):
+        self._entries = IndexableSkipList()
+        self._credits = {}
+        for user_id, data in (users or {}).items():
+            self.update(user_id, data.get("credits", 0))
+
+    def __len__(self):
+        return len(self._credits)
+
+    def update(self, user_id, credits):
+        """Record ``user_id``'s new balance in O(log n)."""
+        old = self._credits.get(user_id)
+        if old == credits:
+            return
+        if old is not None:
+            self._entries.remove((-old, user_id))
+        self._entries.insert((-credits, user_id))
+        self._credits[user_id] = credits
+
+    def remove(self, user_id):
+        old = self._credits.pop(user_id, None)
+        if old is not None:
+            self._entries.remove((-old, user_id))
+
+    def rank(self, user_id):
+        """Return the 1-based leaderboard position of ``user_id``, or None."""
+        credits = self._credits.get(user_id)
+        if credits is None:
+            return None
+        return self._entries.rank((-credits, user_id)) + 1
+
+    def top(self, n=10):
+        """Return up to ``n`` ``(user_id, credits)`` pairs, richest first."""
+        result = []
+        for neg_credits, user_id in self._entries:
+            if len(result) >= n:
+                break
+            result.append((user_id, -neg_credits))
+        return result
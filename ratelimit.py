@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+
+from discord.ext import commands
+
+
+class RateLimited(commands.CheckFailure):
+    """Raised by the global check when a command is over its rate limit."""
+
+    def __init__(self, command, retry_after):
+        super().__init__(f"{command} is rate limited for another {retry_after:.1f}s")
+        self.command = command
+        self.retry_after = retry_after
+
+
+class RateLimit:
+    """A token bucket: ``burst`` calls at once, refilling at ``rate`` calls per second.
+
+    ``per`` picks what the bucket is keyed on: "user", "channel",
+    "user_channel" or "guild". ``cost`` optionally maps a context to the
+    number of tokens the call takes (at most ``burst``, 0 to let it through
+    uncounted), e.g. for commands that do several things at once.
+    """
+
+    __slots__ = ("rate", "burst", "per", "cost", "interval", "tolerance")
+
+    def __init__(self, rate, burst=1, per="user", cost=None):
+        self.rate = rate
+        self.burst = burst
+        self.per = per
+        self.cost = cost
+        self.interval = 1 / rate
+        self.tolerance = self.interval * (burst - 1)
+
+    def tokens(self, ctx):
+        if self.cost is None:
+            return 1
+        return min(max(int(self.cost(ctx)), 0), self.burst)
+
+    def key(self, ctx):
+        if self.per == "user":
+            return ctx.author.id
+        if self.per == "channel":
+            return ctx.channel.id
+        if self.per == "user_channel":
+            return (ctx.author.id, ctx.channel.id)
+        if self.per == "guild":
+            return ctx.guild.id if ctx.guild else ctx.channel.id
+        raise ValueError(f"Unknown rate limit scope: {self.per}")
+
+
+class RateLimiter:
+    """Token-bucket rate limiting for commands, with bounded memory.
+
+    Buckets are stored GCRA-style as a single float per key (the time at
+    which the bucket will be full again), in an ``OrderedDict`` ordered by
+    last use. Buckets that have refilled are swept from the front as new
+    calls come in, and at most ``max_entries`` are kept, so memory tracks
+    recently active users rather than everyone who ever ran a command.
+    """
+
+    def __init__(self, limits, max_entries=200_000):
+        self.limits = limits
+        self.max_entries = max_entries
+        self.stats = {"allowed": 0, "rejected": 0, "evicted": 0}
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def hit(self, command, ctx, now=None):
+        """Take a token for every limit on ``command``.
+
+        Returns:
+            float: 0 if the call is allowed, otherwise seconds until it would be
+        """
+        limits = self.limits.get(command)
+        if not limits:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._sweep(now)
+
+        # (bucket key, limit, seconds of refill the call uses) for the limits it counts against
+        charged = [((command, i, limit.key(ctx)), limit, limit.tokens(ctx) * limit.interval)
+                   for i, limit in enumerate(limits)]
+        charged = [entry for entry in charged if entry[2]]
+        retry_after = 0.0
+        for key, limit, cost in charged:
+            full_at = self._buckets.get(key, now)
+            retry_after = max(retry_after, full_at + cost - limit.interval - limit.tolerance - now)
+        if retry_after > 0:
+            self.stats["rejected"] += 1
+            return retry_after
+
+        for key, _, cost in charged:
+            self._buckets[key] = max(self._buckets.get(key, now), now) + cost
+            self._buckets.move_to_end(key)
+        self.stats["allowed"] += 1
+        return 0.0
+
+    def _sweep(self, now):
+        buckets = self._buckets
+        while buckets:
+            key, full_at = next(iter(buckets.items()))
+            if full_at > now and len(buckets) <= self.max_entries:
+                break
+            if full_at > now:
+                self.stats["evicted"] += 1
+            del buckets[key]
+
+    def check(self, ctx):
+        """Global command check that raises :class:`RateLimited` for excess calls."""
+        if ctx.command is None:
+            return True
+        retry_after = self.hit(ctx.command.qualified_name, ctx)
+        if retry_after > 0:
+            raise RateLimited(ctx.command.qualified_name, retry_after)
+        return True
@@ -0,0 +1,336 @@
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from inventory import ItemCatalogue, migrate_inventory
+from market_book import Market
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    scope TEXT NOT NULL DEFAULT '',
+    user_id TEXT NOT NULL,
+    credits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_users_credits ON users(scope, credits);
+
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    scope TEXT NOT NULL DEFAULT '',
+    user_id TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (scope, user_id, item_id)
+);
+
+CREATE TABLE IF NOT EXISTS market (
+    scope TEXT NOT NULL DEFAULT '',
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    seller TEXT NOT NULL,
+    PRIMARY KEY (scope, id)
+);
+CREATE INDEX IF NOT EXISTS idx_market_seller ON market(scope, seller);
+CREATE INDEX IF NOT EXISTS idx_market_price ON market(scope, price);
+
+CREATE TABLE IF NOT EXISTS boost (
+    scope TEXT NOT NULL DEFAULT '',
+    key TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+UPSERT_USER = (
+    "INSERT INTO users (scope, user_id, credits) VALUES (?, ?, ?) "
+    "ON CONFLICT(scope, user_id) DO UPDATE SET credits = excluded.credits"
+)
+
+UPSERT_LISTING = (
+    "INSERT INTO market (scope, id, name, price, seller) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(scope, id) DO UPDATE SET name = excluded.name, price = excluded.price, seller = excluded.seller"
+)
+
+# Tables that hold one set of rows per guild partition
+SCOPED_TABLES = ("users", "inventory", "market", "boost")
+
+
+class SqliteBackend:
+    """Stores users, market and boost as rows in an SQLite database (WAL mode).
+
+    Each changed user is written with a single-row UPSERT plus a rewrite of
+    that user's ``(item_id, count)`` inventory rows, so saving one command's changes no longer
+    touches the rest of the table. Data sets without a table of their own are
+    stored as JSON documents.
+
+    Per-guild data sets (``guilds/<id>/users.json`` and so on) share the
+    tables, with the file's directory stored in a ``scope`` column ("" for
+    the top-level files).
+    """
+
+    def __init__(self, path="economy.db", fsync="always"):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if fsync == 'always' else 'NORMAL'}")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(market)")]
+        if "position" in columns:
+            # Databases migrated before listings had stable IDs keyed them by position
+            self._conn.execute("ALTER TABLE market RENAME COLUMN position TO id")
+        inventory_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(inventory)")]
+        if "position" in inventory_columns:
+            self._conn.execute("ALTER TABLE inventory RENAME TO inventory_v1")
+        user_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(users)")]
+        unscoped = bool(user_columns) and "scope" not in user_columns
+        if unscoped:
+            self._rename_unscoped_tables()
+        self._conn.executescript(SCHEMA)
+        if "position" in inventory_columns:
+            self._migrate_inventory_counts()
+        if unscoped:
+            self._migrate_unscoped_tables()
+
+    def _migrate_inventory_counts(self):
+        # Inventories used to be one row per copy of an item, fold them into counts
+        with self._lock:
+            self._conn.executescript("""
+                BEGIN;
+                INSERT OR IGNORE INTO items (name) SELECT DISTINCT item FROM inventory_v1;
+                INSERT INTO inventory (user_id, item_id, count)
+                    SELECT v.user_id, i.id, COUNT(*) FROM inventory_v1 v JOIN items i ON i.name = v.item
+                    GROUP BY v.user_id, i.id;
+                DROP TABLE inventory_v1;
+                COMMIT;
+            """)
+
+    def _rename_unscoped_tables(self):
+        # Databases from before guild partitions had no scope column; the
+        # primary keys change, so the tables are rebuilt
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in SCOPED_TABLES:
+            if table in tables:
+                self._conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v2")
+        for index in ("idx_users_credits", "idx_market_seller", "idx_market_price"):
+            self._conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    def _migrate_unscoped_tables(self):
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        columns = {
+            "users": "user_id, credits",
+            "inventory": "user_id, item_id, count",
+            "market": "id, name, price, seller",
+            "boost": "key, value",
+        }
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for table in SCOPED_TABLES:
+                if f"{table}_v2" in tables:
+                    self._conn.execute(
+                        f"INSERT INTO {table} ({columns[table]}) SELECT {columns[table]} FROM {table}_v2"
+                    )
+                    self._conn.execute(f"DROP TABLE {table}_v2")
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _table(filename):
+        """Split ``guilds/123/users.json`` into ``("guilds/123", "users")``."""
+        path = os.path.splitext(os.path.normpath(filename))[0].replace(os.sep, "/")
+        scope, _, table = path.rpartition("/")
+        return scope, table
+
+    # === Loading ===
+    def load(self, filename, default):
+        scope, table = self._table(filename)
+        with self._lock:
+            if table == "users":
+                return self._load_users(scope)
+            if table == "market":
+                rows = self._conn.execute(
+                    "SELECT id, name, price, seller FROM market WHERE scope = ? ORDER BY id", (scope,)
+                )
+                return {str(i): {"name": n, "price": p, "seller": s} for i, n, p, s in rows}
+            if table == "boost":
+                data = dict(self._conn.execute("SELECT key, value FROM boost WHERE scope = ?", (scope,)))
+                return data or default
+            if table == "items":
+                return {str(i): name for i, name in self._conn.execute("SELECT id, name FROM items ORDER BY id")}
+            row = self._conn.execute("SELECT data FROM documents WHERE name = ?", (self._document(scope, table),)).fetchone()
+            return json.loads(row[0]) if row else default
+
+    @staticmethod
+    def _document(scope, table):
+        return f"{scope}/{table}" if scope else table
+
+    def _load_users(self, scope):
+        users = {}
+        for user_id, credits in self._conn.execute("SELECT user_id, credits FROM users WHERE scope = ?", (scope,)):
+            users[user_id] = {"credits": credits, "inventory": {}}
+        rows = self._conn.execute("SELECT user_id, item_id, count FROM inventory WHERE scope = ?", (scope,))
+        for user_id, item_id, count in rows:
+            users.setdefault(user_id, {"credits": 0, "inventory": {}})["inventory"][str(item_id)] = count
+        return users
+
+    # === Saving ===
+    def prepare(self, filename, data, dirty_keys):
+        """Copy the rows that need writing. Runs on the event loop."""
+        scope, table = self._table(filename)
+        if table == "users":
+            keys = data.keys() if dirty_keys is None else dirty_keys
+            rows = {}
+            for key in keys:
+                record = data.get(key)
+                rows[key] = None if record is None else (record.get("credits", 0), dict(record.get("inventory", {})))
+            return (scope, table, dirty_keys is None, rows)
+        if table == "market":
+            keys = data.keys() if dirty_keys is None else dirty_keys
+            rows = {}
+            for key in keys:
+                item = data.get(key)
+                rows[key] = None if item is None else (item["name"], item["price"], item["seller"])
+            return (scope, table, dirty_keys is None, rows)
+        if table == "boost":
+            return (scope, table, True, [(scope, key, value) for key, value in data.items()])
+        if table == "items":
+            keys = data.keys() if dirty_keys is None else dirty_keys
+            return (scope, table, False, [(int(key), data[key]) for key in keys if key in data])
+        return (scope, table, True, json.dumps(data))
+
+    def write(self, filename, payload):
+        """Apply a prepared payload in one transaction. Runs in a worker thread.
+
+        Returns the approximate number of bytes of row data written.
+        """
+        scope, table, replace_all, rows = payload
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if table == "users":
+                    written = self._write_users(scope, rows, replace_all)
+                elif table == "market":
+                    written = self._write_market(scope, rows, replace_all)
+                elif table == "items":
+                    conn.executemany("INSERT OR REPLACE INTO items (id, name) VALUES (?, ?)", rows)
+                    written = sum(len(name) + 4 for _, name in rows)
+                elif table == "boost":
+                    conn.executemany(
+                        "INSERT INTO boost (scope, key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT(scope, key) DO UPDATE SET value = excluded.value",
+                        rows,
+                    )
+                    written = sum(len(str(row)) for row in rows)
+                else:
+                    conn.execute(
+                        "INSERT INTO documents (name, data) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+                        (self._document(scope, table), rows),
+                    )
+                    written = len(rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return written
+
+    def _write_users(self, scope, rows, replace_all):
+        conn = self._conn
+        if replace_all:
+            conn.execute("DELETE FROM users WHERE scope = ?", (scope,))
+            conn.execute("DELETE FROM inventory WHERE scope = ?", (scope,))
+        written = 0
+        for user_id, row in rows.items():
+            conn.execute("DELETE FROM inventory WHERE scope = ? AND user_id = ?", (scope, user_id))
+            if row is None:
+                conn.execute("DELETE FROM users WHERE scope = ? AND user_id = ?", (scope, user_id))
+                continue
+            credits, inventory = row
+            conn.execute(UPSERT_USER, (scope, user_id, credits))
+            conn.executemany(
+                "INSERT INTO inventory (scope, user_id, item_id, count) VALUES (?, ?, ?, ?)",
+                [(scope, user_id, int(item_id), count) for item_id, count in inventory.items()],
+            )
+            written += len(user_id) + len(str(credits)) + 8 * len(inventory)
+        return written
+
+    def _write_market(self, scope, rows, replace_all):
+        conn = self._conn
+        if replace_all:
+            conn.execute("DELETE FROM market WHERE scope = ?", (scope,))
+        written = 0
+        for listing_id, row in rows.items():
+            if row is None:
+                conn.execute("DELETE FROM market WHERE scope = ? AND id = ?", (scope, int(listing_id)))
+                continue
+            conn.execute(UPSERT_LISTING, (scope, int(listing_id), *row))
+            written += len(listing_id) + len(str(row))
+        return written
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Top-level data files, besides items.json which is always migrated
+DATA_FILES = ("users.json", "market.json", "boost.json", "orders.json", "polls.json", "economy.json")
+
+
+def migrate_json_to_sqlite(db_path="economy.db", filenames=DATA_FILES):
+    """Copy the JSON data files into an SQLite database, replacing its contents.
+
+    Args:
+        db_path (str): Path of the SQLite database to create or overwrite
+        filenames (tuple): JSON files to import
+
+    Returns:
+        dict: Number of records imported per file
+    """
+    backend = SqliteBackend(db_path)
+    try:
+        with open("items.json", "r") as f:
+            catalogue = ItemCatalogue(json.load(f))
+    except FileNotFoundError:
+        catalogue = ItemCatalogue()
+    counts = {}
+    try:
+        for filename in filenames:
+            try:
+                with open(filename, "r") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                continue
+            if isinstance(data, list):
+                data = Market(data).listings
+            if filename.endswith("users.json"):
+                for record in data.values():
+                    migrate_inventory(record, catalogue)
+            backend.write(filename, backend.prepare(filename, data, None))
+            counts[filename] = len(data)
+        backend.write("items.json", backend.prepare("items.json", catalogue.names, None))
+    finally:
+        backend.close()
+    return counts
+
+
+if __name__ == "__main__":
+    # Usage: python sqlite_backend.py [economy.db]
+    target = sys.argv[1] if len(sys.argv) > 1 else "economy.db"
+    # Per-guild economies live in guilds/<id>/ (see economy.py)
+    guild_files = sorted(glob.glob(os.path.join("guilds", "*", "*.json")))
+    filenames = list(DATA_FILES) + [f for f in guild_files if not f.endswith("items.json")]
+    for name, count in migrate_json_to_sqlite(target, filenames).items():
+        print(f"Migrated {count} records from {name} into {target}")
@@ -0,0 +1,62 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Records how long each startup phase took, relative to process start.
+
+    Phases may overlap (data loads in the background while the gateway
+    connects), so each one keeps its own start and end time.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = {}
+        self.ready_at = None
+
+    def begin(self, name):
+        self.phases[name] = [time.perf_counter(), None]
+
+    def end(self, name):
+        phase = self.phases.get(name)
+        if phase is not None and phase[1] is None:
+            phase[1] = time.perf_counter()
+
+    def record(self, name, start, end):
+        self.phases[name] = [start, end]
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def ready(self):
+        """Mark the bot ready; returns False if it already was (e.g. after a reconnect)."""
+        if self.ready_at is not None:
+            return False
+        self.ready_at = time.perf_counter()
+        return True
+
+    def durations(self):
+        """Seconds spent in each finished phase, in the order they started."""
+        return {name: end - start for name, (start, end) in self.phases.items() if end is not None}
+
+    def as_dict(self):
+        data = {f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.durations().items()}
+        if self.ready_at is not None:
+            data["time_to_ready_ms"] = round((self.ready_at - self.started) * 1000, 1)
+        return data
+
+    def summary(self):
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.durations().items())
+        return f"⏱️ Ready in {self.ready_at - self.started:.2f}s ({phases})"
+
+    def collect(self):
+        """Metrics collector for :class:`metrics.MetricsRegistry`."""
+        samples = [("startup_phase_seconds", {"phase": name}, seconds) for name, seconds in self.durations().items()]
+        if self.ready_at is not None:
+            samples.append(("startup_phase_seconds", {"phase": "time_to_ready"}, self.ready_at - self.started))
+        return [("startup_phase_seconds", "gauge", "Time spent in each startup phase", samples)]
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from economy import EconomyManager, UnassignedDataError
+from persistence import JsonBackend, WriteBehindStore
+
+
+def _start(home_guild_id=None):
+    """What main.py does at startup: load the top-level economy and install it."""
+    store = WriteBehindStore(JsonBackend(fsync="never"))
+
+    def save_json(filename, data, key=None):
+        store.register(filename, data)
+        store.mark_dirty(filename, key)
+
+    economies = EconomyManager(store, save_json, locks=None, home_guild_id=home_guild_id)
+    home = economies.install(economies.read_home())
+    return store, home
+
+
+def test_restart_after_dm_write(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store, home = _start()
+    home.add_credits("42", 100)  # e.g. !work in a DM
+    store.flush_sync()
+
+    store, home = _start()
+    assert home.users["42"]["credits"] == 100
+
+
+def test_pre_split_data_needs_home_guild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("users.json", "w") as f:
+        json.dump({"42": {"credits": 100, "inventory": {}}}, f)
+
+    with pytest.raises(UnassignedDataError):
+        _start()
+
+    store, home = _start(home_guild_id="dm")
+    store.flush_sync()
+    store, home = _start()
+    assert home.users["42"]["credits"] == 100
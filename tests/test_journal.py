@@ -0,0 +1,107 @@
+import json
+import os
+
+import pytest
+
+import journal
+from journal import JournalBackend, replay
+
+
+def _save_file(backend, filename, data, key):
+    backend.capture(filename, data, key)
+    backend.write(filename, backend.prepare(filename, data, {key}))
+
+
+def _save(backend, data, key):
+    _save_file(backend, "users.json", data, key)
+
+
+def test_recovers_from_torn_tail(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = JournalBackend(directory="journal")
+    users = backend.load("users.json", {})
+    for n in range(1, 4):
+        users[str(n)] = {"credits": n}
+        _save(backend, users, str(n))
+
+    # Crash halfway through appending the third entry
+    segment = journal._segments("journal")[-1]
+    with open(segment, "rb") as f:
+        content = f.read()
+    with open(segment, "wb") as f:
+        f.write(content[:-10])
+
+    backend = JournalBackend(directory="journal")
+    users = backend.load("users.json", {})
+    assert users == {"1": {"credits": 1}, "2": {"credits": 2}}
+    users["4"] = {"credits": 4}
+    _save(backend, users, "4")
+
+    state, seq, replayed = replay("journal")
+    assert state["users"] == {"1": {"credits": 1}, "2": {"credits": 2}, "4": {"credits": 4}}
+    assert (seq, replayed) == (3, 3)
+    with open(segment, "rb") as f:
+        lines = f.read().splitlines()
+    assert [int(line.split(b",")[0][len(b'{"s":'):]) for line in lines] == [1, 2, 3]
+
+
+def test_snapshots_prune_old_segments(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = JournalBackend(directory="journal", snapshot_every=3)
+    users = backend.load("users.json", {})
+    for n in range(1, 11):
+        users[str(n)] = {"credits": n}
+        _save(backend, users, str(n))
+
+    assert [os.path.basename(path) for path in journal._snapshots("journal")] == ["snapshot-000000000009.json"]
+    assert [os.path.basename(path) for path in journal._segments("journal")] == ["journal-000000000009.log"]
+    state, seq, replayed = replay("journal")
+    assert state["users"] == {str(n): {"credits": n} for n in range(1, 11)}
+    assert (seq, replayed) == (10, 1)
+
+
+def test_replay_before_pruned_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(journal.time, "time", lambda: next(clock))
+    backend = JournalBackend(directory="journal", snapshot_every=3)
+    users = backend.load("users.json", {})
+    for n in range(1, 11):
+        users[str(n)] = {"credits": n}
+        _save(backend, users, str(n))
+
+    with open(journal._snapshots("journal")[0]) as f:
+        snapshot_time = json.load(f)["t"]
+    # Entries 1-8 and the snapshots between them were pruned
+    with pytest.raises(ValueError):
+        replay("journal", until=snapshot_time - 1)
+    state, seq, replayed = replay("journal", until=snapshot_time)
+    assert seq == 9 and len(state["users"]) == 9
+
+
+def test_guilds_load_on_demand_and_forget(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = JournalBackend(directory="journal", snapshot_every=4)
+    for guild in ("1", "2"):
+        users = backend.load(f"guilds/{guild}/users.json", {})
+        users["42"] = {"credits": int(guild)}
+        _save_file(backend, f"guilds/{guild}/users.json", users, "42")
+    backend.forget("guilds/1/users.json")
+    assert "guilds/1/users" not in backend._state
+
+    # Restart: only top-level data is rebuilt up front
+    backend = JournalBackend(directory="journal", snapshot_every=4)
+    users = backend.load("users.json", {})
+    assert "guilds/1/users" not in backend._state
+    assert backend.load("guilds/1/users.json", {}) == {"42": {"credits": 1}}
+    backend.forget("guilds/1/users.json")
+
+    # A snapshot still holds the guild that isn't in memory
+    for n in range(4):
+        users[str(n)] = {"credits": n}
+        _save(backend, users, str(n))
+    with open(journal._snapshots("journal")[-1]) as f:
+        data = json.load(f)["data"]
+    assert data["guilds/1/users"] == {"42": {"credits": 1}}
+    assert data["guilds/2/users"] == {"42": {"credits": 2}}
+    assert data["users"]["0"] == {"credits": 0}
@@ -1,8 +1,13 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
 import datetime
 import logging
 import random
+import time
+from dice import DiceError, LIST_LIMIT as DICE_LIST_LIMIT, format_result as format_roll, parse as parse_dice, roll as roll_dice
+from polls import PollStore, parse_duration
+from member_cache import CachedMember
 
 class UtilityCommands(commands.Cog):
     """Utility commands for the Discord bot"""
@@ -10,6 +15,16 @@ class UtilityCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger('discord.utility_commands')
+        # main.py shares a persisted store as bot.polls; otherwise polls only live in memory
+        self.polls = getattr(bot, "polls", None)
+        if self.polls is None:
+            self.polls = PollStore()
+
+    async def cog_load(self):
+        self.close_due_polls.start()
+
+    async def cog_unload(self):
+        self.close_due_polls.cancel()
     
     @commands.command(name="echo")
     async def echo(self, ctx, *, message=None):
@@ -20,33 +35,20 @@ class UtilityCommands(commands.Cog):
             await ctx.send("You need to provide a message for me to echo.")
     
     @commands.command(name="roll")
-    async def roll(self, ctx, dice: str = "1d6"):
-        """Roll dice in NdN format."""
+    async def roll(self, ctx, *, dice: str = "1d6"):
+        """Roll dice, e.g. 2d20, 4d6k3+2, 10d6! or 1000000d20."""
         try:
-            # Parse the dice notation
-            rolls, limit = map(int, dice.split('d'))
-            
-            # Validate input
-            if rolls <= 0 or limit <= 0:
-                await ctx.send("Number of dice and sides must be positive numbers.")
-                return
-            
-            if rolls > 100:
-                await ctx.send("You can't roll more than 100 dice at once.")
-                return
-            
-            # Roll the dice
-            results = [random.randint(1, limit) for _ in range(rolls)]
-            total = sum(results)
-            
-            # Format the response
-            if len(results) == 1:
-                await ctx.send(f"🎲 You rolled a **{results[0]}**")
+            terms, _ = parse_dice(dice)
+            if sum(term.count for term in terms) > DICE_LIST_LIMIT:
+                # Big rolls are summarised, draw them off the event loop
+                result = await asyncio.to_thread(roll_dice, dice)
             else:
-                await ctx.send(f"🎲 You rolled: {', '.join(str(r) for r in results)}\nTotal: **{total}**")
-        
-        except ValueError:
-            await ctx.send("Invalid dice format. Use NdN format (e.g., 1d6, 2d20).")
+                result = roll_dice(dice)
+        except DiceError as e:
+            await ctx.send(f"{e} Use NdN format (e.g., 1d6, 2d20, 4d6k3+2).")
+            return
+
+        await ctx.send(format_roll(result))
     
     @commands.command(name="choose")
     async def choose(self, ctx, *, options=None):
@@ -71,7 +73,7 @@ class UtilityCommands(commands.Cog):
         await ctx.send(f"🤔 I choose: **{selected}**")
     
     @commands.command(name="userinfo")
-    async def user_info(self, ctx, member: discord.Member = None):
+    async def user_info(self, ctx, member: CachedMember = None):
         """Display information about a user."""
         # If no member is specified, use the command author
         member = member or ctx.author
@@ -92,7 +94,8 @@ class UtilityCommands(commands.Cog):
         
         # Add join dates
         embed.add_field(name="Account Created", value=member.created_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
-        embed.add_field(name="Joined Server", value=member.joined_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
+        joined = member.joined_at.strftime("%Y-%m-%d %H:%M:%S") if getattr(member, "joined_at", None) else "Unknown"
+        embed.add_field(name="Joined Server", value=joined, inline=True)
         
         # Add roles (excluding @everyone)
         roles = [role.mention for role in member.roles if role.name != "@everyone"]
@@ -108,49 +111,179 @@ class UtilityCommands(commands.Cog):
     
     @commands.command(name="poll")
     async def poll(self, ctx, question=None, *options):
-        """Create a simple poll with reactions."""
+        """Create a poll with reactions. Add --single for one vote per user and --close=10m to close it automatically."""
         if not question:
             await ctx.send("You need to provide a question for the poll.")
             return
-        
-        if len(options) < 2:
+
+        # The flags can go anywhere after the question
+        single = False
+        duration = None
+        labels = []
+        for option in options:
+            if option.lower() == "--single":
+                single = True
+            elif option.lower().startswith("--close="):
+                try:
+                    duration = parse_duration(option.split("=", 1)[1])
+                except ValueError:
+                    await ctx.send("Invalid close time. Use something like `--close=30m`, `--close=2h` or `--close=1d`.")
+                    return
+            else:
+                labels.append(option)
+
+        if len(labels) > 10:
+            await ctx.send("You can only have up to 10 options in a poll.")
+            return
+
+        embed = discord.Embed(
+            title="📊 Poll",
+            description=question,
+            color=discord.Color.blue()
+        )
+
+        if len(labels) < 2:
             # If not enough options are provided, use yes/no poll
-            embed = discord.Embed(
-                title="📊 Poll",
-                description=question,
-                color=discord.Color.blue()
-            )
-            embed.set_footer(text=f"Poll by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
-            
-            message = await ctx.send(embed=embed)
-            await message.add_reaction("👍")  # Thumbs up
-            await message.add_reaction("👎")  # Thumbs down
+            labels = ["Yes", "No"]
+            emojis = ["👍", "👎"]  # Thumbs up / down
         else:
-            # Multiple choice poll
-            if len(options) > 10:
-                await ctx.send("You can only have up to 10 options in a poll.")
-                return
-            
-            # Emoji options (numbers 1-10)
+            # Multiple choice poll, emoji options (numbers 1-10)
             emoji_options = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
-            
-            embed = discord.Embed(
-                title="📊 Poll",
-                description=question,
-                color=discord.Color.blue()
-            )
-            
+            emojis = emoji_options[:len(labels)]
+
             # Add options to the embed
-            for i, option in enumerate(options):
-                embed.add_field(name=f"Option {i+1}", value=f"{emoji_options[i]} {option}", inline=False)
-            
-            embed.set_footer(text=f"Poll by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
-            
-            message = await ctx.send(embed=embed)
-            
-            # Add reactions for each option
-            for i in range(len(options)):
-                await message.add_reaction(emoji_options[i])
+            for i, option in enumerate(labels):
+                embed.add_field(name=f"Option {i+1}", value=f"{emojis[i]} {option}", inline=False)
+
+        if duration:
+            embed.add_field(name="Closes", value=f"<t:{int(time.time() + duration)}:R>", inline=False)
+
+        number = self.polls.reserve()
+        rules = "One vote per person · " if single else ""
+        embed.set_footer(
+            text=f"Poll #{number} by {ctx.author.name} · {rules}!pollresults {number}",
+            icon_url=ctx.author.avatar.url if ctx.author.avatar else None
+        )
+
+        message = await ctx.send(embed=embed)
+        self.polls.create(number, message, ctx.author.id, question, labels, emojis, single, duration)
+
+        # Add reactions for each option
+        await self.add_reactions(message, emojis)
+
+    @commands.command(name="pollresults")
+    async def poll_results(self, ctx, number: int):
+        """Show a poll's votes so far, or its final result."""
+        record = self.polls.get(number)
+        if record is None or record["g"] != (ctx.guild.id if ctx.guild else None):
+            await ctx.send(f"❌ There's no poll #{number} here.")
+            return
+        await ctx.send(embed=self.results_embed(number, record))
+
+    @commands.command(name="closepoll")
+    async def close_poll(self, ctx, number: int):
+        """Close one of your polls now."""
+        record = self.polls.get(number)
+        if record is None or record["g"] != (ctx.guild.id if ctx.guild else None):
+            await ctx.send(f"❌ There's no poll #{number} here.")
+            return
+        if record["a"] != ctx.author.id:
+            await ctx.send("❌ Only the person who started a poll can close it.")
+            return
+        if self.polls.close(number) is None:
+            await ctx.send(f"Poll #{number} is already closed.")
+            return
+        await ctx.send(embed=self.results_embed(number, record))
+
+    def results_embed(self, number, record):
+        """Build the results embed for a poll from its tally."""
+        counts, voters, closed = self.polls.results(number)
+        total = sum(counts)
+        embed = discord.Embed(
+            title=f"📊 Poll #{number} {'results' if closed else 'so far'}",
+            description=record["q"],
+            color=discord.Color.green() if closed else discord.Color.blue()
+        )
+        for emoji, label, count in zip(record["r"], record["o"], counts):
+            share = count / total if total else 0
+            filled = round(share * 10)
+            embed.add_field(
+                name=f"{emoji} {label}"[:256],
+                value=f"{'█' * filled}{'░' * (10 - filled)} {count} vote{'' if count == 1 else 's'} ({share:.0%})",
+                inline=False
+            )
+        embed.set_footer(text=f"{voters} voter{'' if voters == 1 else 's'} · {'Closed' if closed else 'Open'}")
+        return embed
+
+    # Votes are counted from raw reaction events, so they arrive whether or
+    # not the poll message is in the message cache
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        if payload.user_id == self.bot.user.id or (payload.member is not None and payload.member.bot):
+            return
+        counted = self.polls.vote(payload.message_id, payload.user_id, str(payload.emoji))
+        if counted is None or counted[1] is None:
+            return
+
+        # One vote per person: take back the reaction the vote moved away from
+        channel = self.bot.get_channel(payload.channel_id)
+        if channel is None:
+            return
+        try:
+            await channel.get_partial_message(payload.message_id).remove_reaction(counted[1], discord.Object(payload.user_id))
+        except discord.HTTPException:
+            pass  # No Manage Messages permission, the old reaction just stays (it isn't counted)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        self.polls.unvote(payload.message_id, payload.user_id, str(payload.emoji))
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.polls.forget_message(payload.message_id)
+
+    @tasks.loop(seconds=5)
+    async def close_due_polls(self):
+        """Close polls whose time is up and post their results."""
+        for number, record in self.polls.due():
+            channel = self.bot.get_channel(record["c"])
+            if channel is None:
+                try:
+                    channel = await self.bot.fetch_channel(record["c"])
+                except (discord.NotFound, discord.Forbidden):
+                    # Deleted, or the bot can't see it any more: nowhere to post the results
+                    self.logger.info(f"Closing poll #{number} without posting, its channel is gone")
+                except discord.HTTPException as e:
+                    # Keep the poll open and try again in a minute
+                    self.logger.warning(f"Couldn't find the channel of poll #{number}: {e}")
+                    self.polls.postpone(number, 60)
+                    continue
+            if self.polls.close(number) is None or channel is None:
+                continue
+            try:
+                await channel.send(embed=self.results_embed(number, record))
+            except discord.HTTPException as e:
+                self.logger.warning(f"Couldn't post the results of poll #{number}: {e}")
+
+        # Closed polls are only kept for a while
+        if self.close_due_polls.current_loop % 720 == 0:
+            pruned = self.polls.prune()
+            if pruned:
+                self.logger.info(f"Dropped {pruned} expired poll(s)")
+
+    @close_due_polls.before_loop
+    async def before_close_due_polls(self):
+        # The channel cache is empty until the bot is ready
+        await self.bot.wait_until_ready()
+
+    async def add_reactions(self, message, emojis):
+        """Add reactions in the background through the bot's dispatcher, if it has one."""
+        dispatcher = getattr(self.bot, "dispatcher", None)
+        if dispatcher is not None:
+            dispatcher.add_reactions(message, emojis)
+            return
+        for emoji in emojis:
+            await message.add_reaction(emoji)
 
 async def setup(bot):
     """Add the cog to the bot."""
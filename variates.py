@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import random
+from collections import OrderedDict, deque
+
+_numpy = False  # not imported yet
+
+
+def _import_numpy():
+    # numpy takes a while to import, so it isn't imported with this module:
+    # main.py's startup does it in a worker thread (see preload_numpy)
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:  # numpy is optional, fall back to the random module
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+def preload_numpy():
+    """Import numpy now if it's installed (call from a worker thread). Returns True if it is."""
+    return _import_numpy() is not None
+
+
+def gamma_batch(shape, scale, n):
+    """Draw ``n`` gamma variates in one go (vectorized when numpy is installed)."""
+    numpy = _import_numpy()
+    if numpy is not None:
+        return numpy.random.default_rng().gamma(shape, scale, size=n).tolist()
+    gammavariate = random.gammavariate
+    return [gammavariate(shape, scale) for _ in range(n)]
+
+
+class VariatePool:
+    """Pre-generated random variates, one pool per key (e.g. spin multiplier).
+
+    :meth:`take` pops from the pool; when a pool drops below a quarter of
+    ``size`` it is refilled in a worker thread, so the command path normally
+    does no sampling at all. Only the ``max_pools`` most recently used keys
+    keep a pool.
+    """
+
+    def __init__(self, sampler, size=1024, max_pools=8):
+        self.sampler = sampler
+        self.size = size
+        self.max_pools = max_pools
+        self.logger = logging.getLogger('discord.variates')
+        self.stats = {"served": 0, "sampled_inline": 0, "refills": 0}
+        self._pools = OrderedDict()
+        self._refilling = {}
+
+    def _pool(self, key):
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = deque()
+            while len(self._pools) > self.max_pools:
+                self._pools.popitem(last=False)
+        self._pools.move_to_end(key)
+        return pool
+
+    def prefill(self, key):
+        """Fill ``key``'s pool now, so the first :meth:`take` doesn't sample inline.
+
+        Blocks while sampling, call it from a worker thread.
+        """
+        pool = self._pool(key)
+        if len(pool) < self.size:
+            pool.extend(self.sampler(key, self.size - len(pool)))
+            self.stats["refills"] += 1
+
+    def take(self, key, n=1):
+        """Return ``n`` variates for ``key``."""
+        if n <= 0:
+            return []
+        pool = self._pool(key)
+        if len(pool) < n:
+            # Pool ran dry (new key or a burst), sample the shortfall right here
+            short = n - len(pool)
+            pool.extend(self.sampler(key, short + self.size))
+            self.stats["sampled_inline"] += short
+        values = [pool.popleft() for _ in range(n)]
+        self.stats["served"] += n
+        if len(pool) < self.size // 4:
+            self._schedule_refill(key)
+        return values
+
+    def _schedule_refill(self, key):
+        if key in self._refilling:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._pool(key).extend(self.sampler(key, self.size))
+            self.stats["refills"] += 1
+            return
+        self._refilling[key] = loop.create_task(self._refill(key))
+
+    async def _refill(self, key):
+        try:
+            values = await asyncio.to_thread(self.sampler, key, self.size)
+            if key in self._pools:
+                self._pools[key].extend(values)
+            self.stats["refills"] += 1
+        except Exception:
+            self.logger.exception(f"Refilling variate pool {key!r} failed")
+        finally:
+            self._refilling.pop(key, None)
@@ -0,0 +1,76 @@
+import json
+import logging
+import math
+import time
+
+from aiohttp import web
+
+
+def last_heartbeat_age(bot):
+    """Seconds since the gateway last acknowledged a heartbeat, or None."""
+    keep_alive = getattr(bot.ws, "_keep_alive", None) if bot.ws else None
+    last_ack = getattr(keep_alive, "_last_ack", None)
+    if last_ack is None:
+        return None
+    return time.perf_counter() - last_ack
+
+
+class HealthServer:
+    """Keep-alive, health and metrics endpoints served from the bot's own event loop.
+
+    ``/`` answers the uptime pinger, ``/healthz`` reports gateway state plus
+    any extra ``sections`` (name -> callable returning a JSON-able dict), and
+    ``/metrics`` renders ``registry`` in the Prometheus text format.
+    """
+
+    def __init__(self, bot, registry, sections=None, host="0.0.0.0", port=8080):
+        self.bot = bot
+        self.registry = registry
+        self.sections = sections or {}
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger('discord.web')
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/", self.home)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/metrics", self.metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info(f"Health server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def home(self, request):
+        return web.Response(text="I'm alive!")
+
+    async def healthz(self, request):
+        ready = self.bot.is_ready() and not self.bot.is_closed()
+        latency = self.bot.latency
+        heartbeat_age = last_heartbeat_age(self.bot)
+        body = {
+            "status": "ok" if ready else "starting",
+            "ready": ready,
+            "guilds": len(self.bot.guilds),
+            "gateway_latency_ms": None if math.isnan(latency) or math.isinf(latency) else round(latency * 1000, 1),
+            "last_heartbeat_ack_s": None if heartbeat_age is None else round(heartbeat_age, 1),
+        }
+        for name, section in self.sections.items():
+            body[name] = section()
+        return web.Response(
+            text=json.dumps(body),
+            status=200 if ready else 503,
+            content_type="application/json",
+        )
+
+    async def metrics(self, request):
+        return web.Response(
+            text=self.registry.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )